@@ -0,0 +1,95 @@
+"""
+End-to-end run_agent benchmark: a local HTTP server replays the captured login
+flow (GET / serves debug_pass_1.html, the login POST returns page_after_login.html)
+and a deterministic fake OpenAI client stands in for the model.
+
+    python -m benchmarks.bench_e2e [--runs 5] [--llm-latency 0.5] [--stream] [--headed] [--save-baseline]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault("ACTION_CACHE", "0")
+os.environ.setdefault("TRACING", "0")
+
+from benchmarks.fake_llm import FakeOpenAI
+from benchmarks.fixtures import load_fixture
+from benchmarks.harness import add_baseline_args, finish, measure
+
+LOGIN_FIELDS = {'corpcode': 'SLQA', 'locationcode': 'TEST7', 'username': 'AUTO', 'password': 'AUTO'}
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    pages = {}
+
+    def _send(self, body, status=200):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path in ("/", "/index.html"):
+            self._send(self.pages["login"])
+        else:
+            # Stylesheets/scripts referenced by the captured pages are not needed
+            self._send("", status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        self._send(self.pages["after_login"])
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server():
+    FixtureHandler.pages = {
+        "login": load_fixture("debug_pass_1.html"),
+        "after_login": load_fixture("page_after_login.html"),
+    }
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark run_agent end to end against local fixtures.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="simulated model latency in seconds")
+    parser.add_argument("--headed", action="store_true")
+    parser.add_argument("--stream", action="store_true", help="stream the fake model's reply (LLM_STREAMING=1)")
+    add_baseline_args(parser)
+    args = parser.parse_args()
+    if args.stream:
+        os.environ["LLM_STREAMING"] = "1"
+
+    server = start_server()
+    os.environ["APP_URL"] = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    from core.llm import set_client
+    from runners.run_tests import run_agent
+    fake = FakeOpenAI(latency=args.llm_latency)
+    set_client(fake)
+
+    artifacts_dir = tempfile.mkdtemp(prefix="bench_e2e_")
+
+    def scenario():
+        run_agent(dict(LOGIN_FIELDS), "", headless=not args.headed, artifacts_dir=artifacts_dir)
+
+    try:
+        results = {'e2e/run_agent.login': measure(scenario, min_time=0, min_iterations=args.runs)}
+    finally:
+        server.shutdown()
+    print(f"Fake LLM calls: {fake.calls}")
+    sys.exit(finish(results, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Micro-benchmarks for the per-phase hot paths against the captured fixture pages
+and synthetic pages scaled up to thousands of elements.
+
+    python -m benchmarks.bench_hot_paths [--sizes 500 2000 5000] [--save-baseline]
+"""
+import argparse
+import os
+import sys
+
+os.environ.setdefault("ACTION_CACHE", "0")
+os.environ.setdefault("TRACING", "0")
+
+from benchmarks.fixtures import load_fixtures, synthetic_page
+from benchmarks.harness import add_baseline_args, finish, measure
+from core.agent import build_prompt, get_ui_summary
+from core.snapshot import PageSnapshot
+from core.field_matcher import FieldMatcher
+from core.rule_planner import RulePlanner
+from runners.run_tests import (
+    extract_visible_input_fields, extract_visible_input_fields_with_values, extract_visible_login_buttons,
+    fields_to_fill,
+)
+
+FIELD_VALUES = {'corpcode': 'SLQA', 'locationcode': 'TEST7', 'username': 'AUTO', 'password': 'AUTO'}
+
+
+def page_benchmarks(label, html, min_time):
+    snapshot = PageSnapshot(html)
+    full_summary = snapshot.ui_summary
+    cases = {
+        'snapshot.parse': lambda: PageSnapshot(html),
+        'extract_visible_input_fields': lambda: extract_visible_input_fields(html),
+        'extract_visible_input_fields_with_values': lambda: extract_visible_input_fields_with_values(html),
+        'extract_visible_login_buttons': lambda: extract_visible_login_buttons(html),
+        'get_ui_summary.full': lambda: get_ui_summary(html, mode="full"),
+        'get_ui_summary.compact': lambda: get_ui_summary(html, mode="compact", field_names=FIELD_VALUES),
+        'build_prompt': lambda: build_prompt(full_summary, FIELD_VALUES, "Click on the Login button."),
+        'fields_to_fill': lambda: fields_to_fill(FieldMatcher(FIELD_VALUES), snapshot, set()),
+        'rule_planner.plan': lambda: RulePlanner(FieldMatcher(FIELD_VALUES)).plan(snapshot, FIELD_VALUES),
+        'extractors.shared_snapshot': lambda: (
+            extract_visible_input_fields(snapshot), extract_visible_input_fields_with_values(snapshot),
+            extract_visible_login_buttons(snapshot)
+        ),
+    }
+    return {f"{label}/{name}": measure(fn, min_time=min_time) for name, fn in cases.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extraction, summary and prompt building.")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[500, 2000, 5000],
+                        help="element counts for synthetic pages")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds per benchmark")
+    add_baseline_args(parser)
+    args = parser.parse_args()
+
+    results = {}
+    for name, html in load_fixtures().items():
+        results.update(page_benchmarks(name, html, args.min_time))
+    for size in args.sizes:
+        results.update(page_benchmarks(f"synthetic_{size}", synthetic_page(size), args.min_time))
+    sys.exit(finish(results, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Startup benchmark: wall time of fresh interpreters running the light CLI commands
+and importing the main modules, plus which heavy dependencies each one loads.
+
+    python -m benchmarks.bench_startup [--runs 10] [--save-baseline]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+from benchmarks.fixtures import REPO_ROOT
+from benchmarks.harness import add_baseline_args, finish, measure
+
+HEAVY_MODULES = ("openai", "playwright", "bs4", "lxml")
+
+COMMANDS = {
+    'startup/main.list': ["main.py", "list"],
+    'startup/main.parse': ["main.py", "parse", "features/login.feature::Valid login"],
+    'startup/main.validate': ["main.py", "validate"],
+    'startup/import.core.agent': ["-c", "import core.agent"],
+    'startup/import.runners.run_tests': ["-c", "import runners.run_tests"],
+}
+
+# Prints the heavy modules that importing / running the target pulled in
+PROBE = """
+import runpy, sys
+sys.argv = {argv!r}
+try:
+    runpy.run_path(sys.argv[0], run_name="__main__") if sys.argv[0].endswith(".py") else exec(sys.argv[1])
+except SystemExit:
+    pass
+print("HEAVY", sorted({{m.split(".")[0] for m in sys.modules}} & set({heavy!r})))
+"""
+
+
+def _env():
+    env = dict(os.environ)
+    env.pop("OPENAI_API_KEY", None)  # light commands must not need it
+    return env
+
+
+def run_command(args):
+    return subprocess.run([sys.executable, *args], cwd=REPO_ROOT, env=_env(),
+                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+
+def heavy_modules(args):
+    argv = args if args[0] != "-c" else ["-c", args[1]]
+    out = subprocess.run([sys.executable, "-c", PROBE.format(argv=argv, heavy=HEAVY_MODULES)], cwd=REPO_ROOT,
+                         env=_env(), capture_output=True, text=True).stdout
+    line = next((l for l in out.splitlines() if l.startswith("HEAVY")), "HEAVY ?")
+    return line[len("HEAVY "):]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CLI startup and module import time.")
+    parser.add_argument("--runs", type=int, default=10)
+    add_baseline_args(parser)
+    args = parser.parse_args()
+
+    results = {name: measure(lambda a=cmd: run_command(a), min_time=0, min_iterations=args.runs)
+               for name, cmd in COMMANDS.items()}
+    for name, cmd in COMMANDS.items():
+        print(f"{name:<40} loads {heavy_modules(cmd)}")
+    sys.exit(finish(results, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import json
+import re
+import time
+from types import SimpleNamespace
+
+_FIELD = re.compile(r'Field "([^"]+)" MUST be filled with exactly: "([^"]*)"')
+_IDENTIFIER = re.compile(r'''(automation_id|id|name)\s*=\s*["']([^"']+)["']''')
+
+
+def _selector_for(field, prompt):
+    """First identifier in the page summary that contains the field key."""
+    key = field.replace(" ", "").lower()
+    for attr, value in _IDENTIFIER.findall(prompt):
+        if key in value.replace(" ", "").lower():
+            return f"#{value}" if attr == "id" else f"[{attr}='{value}']"
+    return None
+
+
+def fake_completion(prompt):
+    """Deterministic stand-in for the model: fills every requested field it can locate."""
+    actions = []
+    for field, value in _FIELD.findall(prompt):
+        selector = _selector_for(field, prompt)
+        if selector:
+            actions.append({"action": "fill", "selector": selector, "value": value})
+    if '"when_visible"' in prompt:
+        stages = [{"when_visible": [a["selector"]], "actions": [a]} for a in actions]
+        return json.dumps(stages)
+    return json.dumps(actions)
+
+
+class FakeOpenAI:
+    """Mimics the parts of the OpenAI client the agent uses: chat.completions.create."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, temperature=0, stream=False, **kwargs):
+        self.calls += 1
+        prompt = messages[-1]["content"]
+        content = fake_completion(prompt)
+        usage = SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=len(content) // 4)
+        if stream:
+            return self._stream(content, usage)
+        if self.latency:
+            time.sleep(self.latency)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+    def _stream(self, content, usage, chunk_size=8):
+        """Chunks spread over the same latency, like a real reply being generated."""
+        pieces = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+        for piece in pieces:
+            if self.latency:
+                time.sleep(self.latency / len(pieces))
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))], usage=None)
+        yield SimpleNamespace(choices=[], usage=usage)
@@ -0,0 +1,51 @@
+import os
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Real pages captured from the myHub login flow
+FIXTURE_PAGES = ["debug_pass_1.html", "debug_pass_2.html", "page_after_login.html", "phase_1_ui.html"]
+
+
+def load_fixture(name):
+    with open(os.path.join(REPO_ROOT, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def load_fixtures():
+    return {name: load_fixture(name) for name in FIXTURE_PAGES}
+
+
+def synthetic_page(elements, depth=8):
+    """
+    A form-heavy page with roughly `elements` interactive elements: nested wrappers,
+    labels, hidden sections (inline style, hidden attribute, aria-hidden) and buttons.
+    """
+    blocks = []
+    for i in range(elements // 4):
+        hide = i % 7
+        if hide == 1:
+            open_attrs = ' style="display: none;"'
+        elif hide == 2:
+            open_attrs = ' hidden'
+        elif hide == 3:
+            open_attrs = ' aria-hidden="true"'
+        else:
+            open_attrs = ''
+        wrappers_open = "".join(f'<div class="level-{d}">' for d in range(depth))
+        wrappers_close = "</div>" * depth
+        blocks.append(
+            f'<section{open_attrs}>{wrappers_open}'
+            f'<label for="field_{i}">Field {i}</label>'
+            f'<input automation_id="txt_field{i}" id="field_{i}" name="Form.Field{i}" '
+            f'type="{"password" if i % 5 == 0 else "text"}" value="" class="form-control uppercase" '
+            f'data-val="true" data-val-required="Field {i} is required.">'
+            f'<select name="Form.Choice{i}"><option>A</option><option>B</option></select>'
+            f'<a href="/help/{i}">Help for field {i}</a>'
+            f'<button type="button" id="btn_{i}">{"Login" if i % 50 == 0 else "Next"}</button>'
+            f'{wrappers_close}</section>'
+        )
+    return (
+        "<!DOCTYPE html><html><head><title>Synthetic</title></head><body>"
+        f'<form action="/submit" method="post">{"".join(blocks)}</form>'
+        "</body></html>"
+    )
@@ -0,0 +1,105 @@
+import json
+import os
+import time
+import tracemalloc
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def _percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(fn, min_time=0.5, min_iterations=5, max_iterations=10000):
+    """Call fn repeatedly; returns throughput, latency percentiles (ms) and peak memory (KiB)."""
+    fn()  # warm-up
+    durations = []
+    start = time.perf_counter()
+    while len(durations) < max_iterations and (
+            len(durations) < min_iterations or time.perf_counter() - start < min_time):
+        t0 = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    durations.sort()
+    return {
+        'iterations': len(durations),
+        'ops_per_sec': round(len(durations) / elapsed, 2),
+        'p50_ms': round(_percentile(durations, 50) * 1000, 3),
+        'p95_ms': round(_percentile(durations, 95) * 1000, 3),
+        'p99_ms': round(_percentile(durations, 99) * 1000, 3),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def load_baseline(path=BASELINE_FILE):
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    return {}
+
+
+def save_baseline(results, path=BASELINE_FILE):
+    baseline = load_baseline(path)
+    baseline.update(results)
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def compare(results, baseline, tolerance=0.25):
+    """Names whose p50 latency or peak memory grew more than `tolerance` over the baseline."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in ('p50_ms', 'peak_kib'):
+            if base.get(metric) and result[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {base[metric]} -> {result[metric]}")
+    return regressions
+
+
+def print_table(results, baseline=None):
+    baseline = baseline or {}
+    print(f"{'benchmark':<56}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak KiB':>11}{'vs base':>9}")
+    for name, r in results.items():
+        base = baseline.get(name, {}).get('p50_ms')
+        delta = f"{(r['p50_ms'] / base - 1) * 100:+.0f}%" if base else "-"
+        print(f"{name:<56}{r['ops_per_sec']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}"
+              f"{r['peak_kib']:>11}{delta:>9}")
+
+
+def finish(results, args):
+    """
+    Shared CLI tail: print, compare against the stored baseline, optionally update it.
+    Exits 1 on a regression and 2 when no benchmark had a baseline to compare with.
+    """
+    baseline = load_baseline(args.baseline)
+    print_table(results, baseline)
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    missing = [name for name in results if not baseline.get(name)]
+    for name in missing:
+        print(f"NO BASELINE {name}: not compared (run with --save-baseline on a reference machine)")
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if regressions:
+        return 1
+    # Nothing compared at all (fresh checkout, wrong --baseline): a pass here would mean nothing
+    return 2 if len(missing) == len(results) else 0
+
+
+def add_baseline_args(parser):
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing")
@@ -0,0 +1,150 @@
+# core/action_cache.py
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from core.field_matcher import FieldMatcher
+from utils.config import ACTION_CACHE_ENABLED, ACTION_CACHE_FILE
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# Attributes that describe the structure of a control, not its current state
+FINGERPRINT_ATTRS = ('automation_id', 'id', 'name', 'type', 'placeholder')
+
+
+def page_fingerprint(snapshot, field_names):
+    """
+    Structural fingerprint of the UI summary plus the requested field names.
+    Values, classes and other volatile attributes are ignored so the same form
+    maps to the same key across runs.
+    """
+    parts = []
+    for tag, attrs in snapshot.summary_elements:
+        parts.append("|".join([tag] + [str(attrs.get(a, '') or '') for a in FINGERPRINT_ATTRS]))
+    parts.append("fields:" + ",".join(sorted(k.lower() for k in field_names)))
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def _to_template(actions):
+    """Replace literal values with the field key they came from (see tag_actions)."""
+    templated = []
+    for action in actions:
+        entry = {'action': action['action'], 'selector': action['selector']}
+        if action.get('field'):
+            entry['field'] = action['field']
+        elif 'value' in action:
+            entry['value'] = action['value']
+        templated.append(entry)
+    return templated
+
+
+def _render(templated, field_values):
+    actions = []
+    for entry in templated:
+        action = {'action': entry['action'], 'selector': entry['selector']}
+        if 'field' in entry:
+            if entry['field'] not in field_values:
+                return None
+            action['field'] = entry['field']
+            action['value'] = field_values[entry['field']]
+        elif 'value' in entry:
+            action['value'] = entry['value']
+        actions.append(action)
+    return actions
+
+
+class ActionCache:
+    """SQLite store of validated action lists keyed by page fingerprint."""
+
+    def __init__(self, path=ACTION_CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS actions ("
+            "key TEXT PRIMARY KEY, actions TEXT NOT NULL, hits INTEGER DEFAULT 0, "
+            "created REAL, last_used REAL)"
+        )
+        self._conn.commit()
+
+    def lookup(self, key, field_values):
+        with self._lock:
+            row = self._conn.execute("SELECT actions FROM actions WHERE key = ?", (key,)).fetchone()
+            if not row:
+                return None
+            self._conn.execute(
+                "UPDATE actions SET hits = hits + 1, last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+        return _render(json.loads(row[0]), field_values)
+
+    def store(self, key, actions):
+        payload = json.dumps(_to_template(actions))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO actions (key, actions, hits, created, last_used) VALUES (?, ?, 0, ?, ?)",
+                (key, payload, now, now)
+            )
+            self._conn.commit()
+
+    def evict(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM actions WHERE key = ?", (key,))
+            self._conn.commit()
+
+
+_cache = None
+
+
+def get_action_cache():
+    """Process-wide cache, or None when disabled with ACTION_CACHE=0."""
+    global _cache
+    if not ACTION_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = ActionCache()
+    return _cache
+
+
+def tag_actions(actions, key, field_values, cached):
+    """Remember where each action came from so its outcome can update the cache."""
+    for action in actions:
+        action['cache_key'] = key
+        action['cached'] = cached
+        if 'value' in action and 'field' not in action:
+            fields = [k for k, v in field_values.items() if v == action['value']]
+            # A value shared by several fields (username = password) only names one if the
+            # selector does; otherwise the element the fill hits decides (run_tests.mark_filled)
+            field = fields[0] if len(fields) == 1 else (
+                FieldMatcher({k: field_values[k] for k in fields}).field_for([action['selector']]) if fields else None)
+            if field is not None:
+                action['field'] = field
+    return actions
+
+
+def record_action_results(actions, failed):
+    """
+    Store LLM-planned action lists that fully succeeded, and evict cached
+    entries whose selectors failed so the next phase falls back to the model.
+    """
+    cache = get_action_cache()
+    if cache is None:
+        return
+    failed_ids = {id(a) for a in failed}
+    groups = {}
+    for action in actions:
+        if action.get('cache_key'):
+            groups.setdefault(action['cache_key'], []).append(action)
+
+    for key, group in groups.items():
+        group_failed = any(id(a) in failed_ids for a in group)
+        if group[0]['cached']:
+            if group_failed:
+                logger.info(f"🗑️ Cached actions failed, evicting {key[:12]}")
+                cache.evict(key)
+        elif not group_failed:
+            cache.store(key, group)
@@ -0,0 +1,80 @@
+# core/action_stream.py
+
+import json
+from utils.logger import get_logger
+
+logger = get_logger()
+
+
+class ActionStreamParser:
+    """
+    Incremental parser for the model's JSON action array. feed() takes the reply as it
+    streams in and returns every action object completed by that chunk, so actions can
+    run before the rest of the reply arrives. Code fences and text around the array are
+    skipped, and an object that isn't valid JSON is dropped instead of failing the rest.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0           # next character of buffer to scan
+        self.started = False   # seen the opening '['
+        self.finished = False  # seen the closing ']'
+        self.depth = 0         # brace depth inside the array
+        self.object_start = None
+        self.in_string = False
+        self.escaped = False
+        self.skipped = 0
+
+    def feed(self, text):
+        self.buffer += text
+        completed = []
+        buffer = self.buffer
+        for i in range(self.pos, len(buffer)):
+            if self.finished:
+                break
+            ch = buffer[i]
+            if not self.started:
+                self.started = ch == '['
+                continue
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == '\\':
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = self.depth > 0
+            elif ch == '{':
+                if self.depth == 0:
+                    self.object_start = i
+                self.depth += 1
+            elif ch == '}' and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    self._complete(buffer[self.object_start:i + 1], completed)
+                    self.object_start = None
+            elif ch == ']' and self.depth == 0:
+                self.finished = True
+        self.pos = len(buffer)
+        # Only the object being read has to be kept
+        if self.object_start is None:
+            self.buffer, self.pos = "", 0
+        elif self.object_start:
+            self.buffer = self.buffer[self.object_start:]
+            self.pos -= self.object_start
+            self.object_start = 0
+        return completed
+
+    def _complete(self, text, completed):
+        try:
+            action = json.loads(text)
+        except json.JSONDecodeError as e:
+            self.skipped += 1
+            logger.warning(f"⚠️ Skipping malformed action in the model output: {e}")
+            return
+        if isinstance(action, dict) and action.get('action') and action.get('selector'):
+            completed.append(action)
+        else:
+            self.skipped += 1
+            logger.warning(f"⚠️ Skipping incomplete action in the model output: {text[:80]}")
@@ -1,32 +1,24 @@
 # core/agent.py
 
-from bs4 import BeautifulSoup
-from openai import OpenAI
-import os
 import json
-from dotenv import load_dotenv
-from utils.environment import load_env
-from time import sleep
-
-# Load environment variables
-load_dotenv()
-api_key = load_env()
-client = OpenAI(api_key=api_key)
-
-def get_ui_summary(html):
-    soup = BeautifulSoup(html, 'html.parser')
-    elements = []
-    for e in soup.find_all(['input', 'button', 'a', 'select', 'textarea', 'form'])[:100]:
-        style = (e.get('style', '') or '').replace(" ", "").lower()
-        e_type = (e.get('type', '') or '').lower()
-        hidden_by_css = 'display:none' in style or 'visibility:hidden' in style
-        hidden_by_type = e_type == 'hidden'
-        # Skip hidden or not visible elements
-        if hidden_by_css or hidden_by_type:
-            continue
-        # Also skip if input is outside of the viewport (optionally add more checks)
-        elements.append(f"{str(e)}\nAttributes: {e.attrs}")
-    return "\n".join(elements)
+import time
+from core.action_stream import ActionStreamParser
+from core.drive import Blocking, drive, drive_async
+from core.llm import get_gateway
+from core.snapshot import as_snapshot, snapshot_steps
+from core.action_cache import get_action_cache, page_fingerprint, tag_actions
+from core.summary import compact_summary, estimate_tokens
+from core.settle import settle_steps
+from utils.tracing import span
+from utils.config import LLM_MODEL, UI_SUMMARY_MODE, UI_SUMMARY_TOKEN_BUDGET
+
+def get_ui_summary(html, mode=None, field_names=(), token_budget=None):
+    snapshot = as_snapshot(html)
+    mode = mode or UI_SUMMARY_MODE
+    with span("extract.ui_summary", mode=mode):
+        if mode == "compact":
+            return compact_summary(snapshot, field_names, token_budget or UI_SUMMARY_TOKEN_BUDGET)
+        return snapshot.ui_summary
 
 def build_prompt(ui_summary, field_values, additional_goal):
     field_instructions = "\n".join([
@@ -71,52 +63,157 @@ DO NOT fill any value unless it's in the provided field list.
 Only interact with elements that appear in the HTML summary above.
 """
 
-def get_next_actions(page, field_values, additional_goal="Click on the Login button."):
+def _messages(prompt):
+    return [
+        {"role": "system", "content": "You are an automation agent."},
+        {"role": "user", "content": prompt}
+    ]
+
+def complete(prompt):
+    """Send the prompt to the model through the shared gateway and return the raw text of its reply."""
+    with span("llm.call", model=LLM_MODEL) as s:
+        response = get_gateway().chat(LLM_MODEL, _messages(prompt), temperature=0,
+                                      estimated_tokens=estimate_tokens(prompt), attrs=s)
+        usage = getattr(response, "usage", None)
+        if usage is not None and not s.get('deduped'):
+            s['prompt_tokens'] = usage.prompt_tokens
+            s['completion_tokens'] = usage.completion_tokens
+        return response.choices[0].message.content
+
+def parse_json_output(raw_output):
+    raw_output = raw_output.strip()
+    if raw_output.startswith("```json"):
+        raw_output = raw_output[7:]
+    elif raw_output.startswith("```"):
+        raw_output = raw_output[3:]
+
+    if raw_output.endswith("```"):
+        raw_output = raw_output[:-3]
+
+    print("[DEBUG] Cleaned GPT Output:", raw_output)
+
+    return json.loads(raw_output)
+
+def request_actions(prompt):
+    """Send the prompt to the model and parse the JSON action list it returns."""
+    return parse_json_output(complete(prompt))
+
+def stream_actions(prompt):
+    """Streams the reply and yields each action as soon as its JSON object is complete."""
+    parser = ActionStreamParser()
+    with span("llm.call", model=LLM_MODEL, stream=True) as s:
+        start = time.perf_counter()
+        count = 0
+        for text in get_gateway().stream(LLM_MODEL, _messages(prompt), temperature=0,
+                                         estimated_tokens=estimate_tokens(prompt), attrs=s):
+            for action in parser.feed(text):
+                if not count:
+                    s['first_action_ms'] = round((time.perf_counter() - start) * 1000, 3)
+                count += 1
+                yield action
+        s.update(actions=count, skipped=parser.skipped)
+    if not parser.finished:
+        print(f"[ERROR] GPT reply ended before the action list was closed; using its {count} complete actions")
+
+def cached_actions(current, field_values):
+    """Returns (cache key, cached actions or None) for the current page."""
+    cache = get_action_cache()
+    with span("cache.lookup") as s:
+        key = page_fingerprint(current, field_values)
+        cached = cache.lookup(key, field_values) if cache else None
+        s['hit'] = cached is not None
+    if cached is not None:
+        print(f"[INFO] Action cache hit ({key[:12]}), skipping GPT.")
+        cached = tag_actions(cached, key, field_values, cached=True)
+    return key, cached
+
+def build_step_prompt(current, field_values, additional_goal):
+    ui_summary = get_ui_summary(current, field_names=field_values)
+    with span("prompt.build") as s:
+        prompt = build_prompt(ui_summary, field_values, additional_goal)
+        s['tokens_estimate'] = estimate_tokens(prompt)
+    if UI_SUMMARY_MODE == "compact":
+        full_tokens = estimate_tokens(build_prompt(current.ui_summary, field_values, additional_goal))
+        print(f"[INFO] Prompt size: ~{full_tokens} tokens full, ~{estimate_tokens(prompt)} tokens compact")
+    print("[DEBUG] Prompt sent to GPT:\n", prompt)
+    return prompt
+
+def _new_unseen(new_actions, seen_selectors):
+    filtered = [a for a in new_actions if a['selector'] not in seen_selectors]
+    for a in filtered:
+        seen_selectors.add(a['selector'])
+    return filtered
+
+def _clicks_login(actions):
+    return any(a['action'] == 'click' and 'login' in a['selector'].lower() for a in actions)
+
+def get_next_actions(page, field_values, additional_goal="Click on the Login button.", snapshot=None,
+                     backend=None, settle_options=None, focus=None, on_action=None):
+    """
+    focus: an optional view of `snapshot` (see core.dom_diff) that the first prompt is
+    built from instead of the whole page; the action cache is still keyed on the page.
+    on_action: when given, the model's reply is streamed and the steps of
+    on_action(action) run for each new action as soon as it is parsed (cached actions
+    are only returned).
+    """
+    return drive(get_next_actions_steps(page, field_values, additional_goal, snapshot, backend, settle_options,
+                                        focus, on_action))
+
+async def get_next_actions_async(page, field_values, additional_goal="Click on the Login button.",
+                                 snapshot=None, backend=None, settle_options=None, focus=None, on_action=None):
+    """get_next_actions() for playwright.async_api pages."""
+    return await drive_async(get_next_actions_steps(page, field_values, additional_goal, snapshot, backend,
+                                                    settle_options, focus, on_action))
+
+def get_next_actions_steps(page, field_values, additional_goal="Click on the Login button.", snapshot=None,
+                           backend=None, settle_options=None, focus=None, on_action=None):
+    """
+    get_next_actions() as steps for core.drive. Model calls are blocking steps, so on
+    an async page one scenario's LLM latency overlaps with other scenarios' browser work.
+    """
     actions_to_perform = []
     seen_selectors = set()
 
     for step in range(2):  # Retry cycle: before and after login UI update
-        html = page.content()
-        ui_summary = get_ui_summary(html)
-        prompt = build_prompt(ui_summary, field_values, additional_goal)
-
-        print("[DEBUG] Prompt sent to GPT:\n", prompt)
+        # The caller's snapshot is only current for the first step
+        current = snapshot if step == 0 and snapshot is not None else (yield from snapshot_steps(page, backend))
 
         try:
-            response = client.chat.completions.create(
-                model="gpt-4.1",
-                messages=[
-                    {"role": "system", "content": "You are an automation agent."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0
-            )
-
-            raw_output = response.choices[0].message.content.strip()
-            if raw_output.startswith("```json"):
-                raw_output = raw_output[7:]
-            elif raw_output.startswith("```"):
-                raw_output = raw_output[3:]
-
-            if raw_output.endswith("```"):
-                raw_output = raw_output[:-3]
-
-            print("[DEBUG] Cleaned GPT Output:", raw_output)
-
-            new_actions = json.loads(raw_output)
-
-            filtered = [a for a in new_actions if a['selector'] not in seen_selectors]
-            for a in filtered:
-                seen_selectors.add(a['selector'])
-
-            actions_to_perform.extend(filtered)
-
-            if any(a['action'] == 'click' and 'login' in a['selector'].lower() for a in filtered):
+            key, new_actions = cached_actions(current, field_values)
+            if new_actions is None:
+                view = focus if step == 0 and focus is not None else current
+                prompt = build_step_prompt(view, field_values, additional_goal)
+            if new_actions is None and on_action is not None:
+                filtered = []
+                stream = stream_actions(prompt)
+                try:
+                    while True:
+                        streamed = yield Blocking(next, stream, None)  # each wait for the model is blocking
+                        if streamed is None:
+                            break
+                        for action in _new_unseen(tag_actions([streamed], key, field_values, cached=False),
+                                                  seen_selectors):
+                            filtered.append(action)
+                            actions_to_perform.append(action)  # kept even if the stream breaks later
+                            yield from on_action(action)
+                finally:
+                    stream.close()
+            else:
+                if new_actions is None:
+                    new_actions = tag_actions((yield Blocking(request_actions, prompt)), key, field_values,
+                                              cached=False)
+                filtered = _new_unseen(new_actions, seen_selectors)
+                actions_to_perform.extend(filtered)
+
+            if _clicks_login(filtered):
                 print("[INFO] Detected login click. Waiting for UI changes...")
-                page.wait_for_timeout(3000)  # Give time for the next screen to load
+                yield from settle_steps(page, options=settle_options)
 
+        except json.JSONDecodeError as e:
+            print(f"[ERROR] GPT returned invalid JSON at step {step + 1}: {e}")
         except Exception as e:
-            print(f"[ERROR] GPT failed: {e}")
+            # The gateway already retried transient errors; keep what was planned so far
+            print(f"[ERROR] GPT failed at step {step + 1} with {len(actions_to_perform)} actions planned: {e}")
             break
 
     return actions_to_perform
@@ -0,0 +1,179 @@
+# core/browser.py
+
+import atexit
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from urllib.parse import urlsplit
+from utils.config import BLOCKED_DOMAINS, BROWSER_PROFILE
+from utils.tracing import span
+# Analytics, tag managers and session recorders: nothing the tests look at
+ANALYTICS_DOMAINS = (
+    'google-analytics.com', 'googletagmanager.com', 'doubleclick.net', 'googleadservices.com',
+    'facebook.net', 'hotjar.com', 'segment.io', 'segment.com', 'mixpanel.com',
+    'newrelic.com', 'nr-data.net', 'fullstory.com', 'clarity.ms', 'intercom.io', 'optimizely.com',
+    'quantserve.com', 'scorecardresearch.com',
+)
+
+# Chromium features a test run never needs: background updates/sync, extensions, audio
+PERFORMANCE_ARGS = (
+    '--disable-extensions', '--disable-component-update', '--disable-background-networking',
+    '--disable-background-timer-throttling', '--disable-backgrounding-occluded-windows',
+    '--disable-renderer-backgrounding', '--disable-default-apps', '--disable-sync', '--disable-dev-shm-usage',
+    '--mute-audio', '--no-first-run', '--blink-settings=imagesEnabled=false',
+)
+
+PROFILES = {
+    # What run_agent always did: a headed browser per scenario, every request allowed
+    'default': {
+        'headless': False,
+        'args': (),
+        'block_resources': (),
+        'block_domains': (),
+        'context': {},
+        'reuse_browser': False,
+    },
+    # Throughput runs: headless, no images/media/fonts/analytics, one browser per process.
+    # Stylesheets and the app's own scripts still load; visibility checks depend on them.
+    'performance': {
+        'headless': True,
+        'args': PERFORMANCE_ARGS,
+        'block_resources': ('image', 'media', 'font'),
+        'block_domains': ANALYTICS_DOMAINS,
+        'context': {'service_workers': 'block', 'reduced_motion': 'reduce'},
+        'reuse_browser': True,
+    },
+}
+
+_playwright = None
+_browsers = {}
+_lock = threading.Lock()
+
+
+def get_profile(name=None):
+    name = name or BROWSER_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown browser profile {name!r}, expected one of {sorted(PROFILES)}")
+    profile = dict(PROFILES[name], name=name)
+    profile['block_domains'] = frozenset(profile['block_domains']) | frozenset(BLOCKED_DOMAINS)
+    return profile
+
+
+def should_block(url, resource_type, profile):
+    if resource_type in profile['block_resources']:
+        return True
+    domains = profile['block_domains']
+    if not domains:
+        return False
+    labels = (urlsplit(url).hostname or '').split('.')
+    # www.google-analytics.com -> google-analytics.com -> com
+    return any('.'.join(labels[i:]) in domains for i in range(len(labels) - 1))
+
+
+def _router(profile, counts):
+    def handle(route):
+        request = route.request
+        if should_block(request.url, request.resource_type, profile):
+            counts['blocked'] += 1
+            route.abort()
+        else:
+            route.continue_()
+    return handle
+
+
+def install_routes(context, profile):
+    """Abort the requests the profile blocks; returns {'blocked': n}, updated as the pages load."""
+    counts = {'blocked': 0}
+    if profile['block_resources'] or profile['block_domains']:
+        context.route("**/*", _router(profile, counts))
+    return counts
+
+
+def _async_router(profile, counts):
+    async def handle(route):
+        request = route.request
+        if should_block(request.url, request.resource_type, profile):
+            counts['blocked'] += 1
+            await route.abort()
+        else:
+            await route.continue_()
+    return handle
+
+
+async def install_routes_async(context, profile):
+    counts = {'blocked': 0}
+    if profile['block_resources'] or profile['block_domains']:
+        await context.route("**/*", _async_router(profile, counts))
+    return counts
+
+
+def launch_options(profile, headless=None):
+    return {'headless': profile['headless'] if headless is None else headless, 'args': list(profile['args'])}
+
+
+def _sync_playwright():
+    """The process's Playwright driver, started on first use and stopped at exit."""
+    global _playwright
+    if _playwright is None:
+        from playwright.sync_api import sync_playwright
+        _playwright = sync_playwright().start()
+        atexit.register(close_browsers)
+    return _playwright
+
+
+def _shared_browser(options):
+    """One browser per launch options for the whole process; relaunched if it crashed."""
+    with _lock:
+        key = (options['headless'], tuple(options['args']))
+        browser = _browsers.get(key)
+        if browser is None or not browser.is_connected():
+            browser = _browsers[key] = _sync_playwright().chromium.launch(**options)
+        return browser
+
+
+def close_browsers(stop_driver=True):
+    """Close the shared browsers; stop_driver=False keeps Playwright running for the next launch."""
+    global _playwright
+    with _lock:
+        for browser in _browsers.values():
+            try:
+                browser.close()
+            except Exception:
+                pass
+        _browsers.clear()
+        if stop_driver and _playwright is not None:
+            _playwright.stop()
+            _playwright = None
+
+
+@contextmanager
+def browser_context(profile=None, headless=None, **options):
+    """
+    A fresh context (isolated cookies/storage) with the profile's routing rules. With
+    reuse_browser the browser outlives the context and serves the next scenario;
+    otherwise it is launched and closed with it. Yields (context, blocked counts).
+    """
+    profile = profile if isinstance(profile, dict) else get_profile(profile)
+    launch = launch_options(profile, headless)
+    with span("browser.launch", profile=profile['name'], reused=profile['reuse_browser']):
+        if profile['reuse_browser']:
+            browser = _shared_browser(launch)
+        else:
+            with _lock:
+                browser = _sync_playwright().chromium.launch(**launch)
+        context = browser.new_context(**profile['context'], **options)
+    try:
+        yield context, install_routes(context, profile)
+    finally:
+        context.close()
+        if not profile['reuse_browser']:
+            browser.close()
+
+
+@asynccontextmanager
+async def new_context_async(browser, profile, **options):
+    """browser_context() for a browser the async runner already launched."""
+    context = await browser.new_context(**profile['context'], **options)
+    try:
+        yield context, await install_routes_async(context, profile)
+    finally:
+        await context.close()
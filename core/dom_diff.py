@@ -0,0 +1,144 @@
+# core/dom_diff.py
+
+from core.summary import normalize
+from utils.logger import get_logger
+from utils.tracing import span
+
+logger = get_logger()
+
+FORM_CONTROLS = ('input', 'select', 'textarea')
+BUTTON_TYPES = ('submit', 'button')
+# Attributes that flip as the user interacts (focus/validation classes and states,
+# inline styles) without the element itself changing
+VOLATILE_ATTRS = ('class', 'style', 'aria-invalid', 'aria-describedby')
+
+
+def _is_button(tag, attrs):
+    return tag == 'button' or (attrs.get('type') or '').lower() in BUTTON_TYPES
+
+
+def element_key(tag, attrs):
+    """Stable identity for an element across phases: its identifier, else tag/type/label."""
+    identifier = attrs.get('automation_id') or attrs.get('id') or attrs.get('name') or attrs.get('placeholder')
+    if identifier:
+        return f"{tag}#{identifier}"
+    label = attrs.get('value') if _is_button(tag, attrs) else ''
+    return f"{tag}:{(attrs.get('type') or '').lower()}:{label or ''}"
+
+
+def keyed(elements):
+    """[(key, element)] for (tag, attrs) pairs or control dicts; repeats get a [n] suffix."""
+    counts = {}
+    out = []
+    for element in elements:
+        tag, attrs = (element['tag'], element['attrs']) if isinstance(element, dict) else element
+        base = element_key(tag, attrs)
+        n = counts.get(base, 0)
+        counts[base] = n + 1
+        out.append((f"{base}[{n}]" if n else base, element))
+    return out
+
+
+def _signature(control):
+    attrs = control['attrs']
+    if control['tag'] in FORM_CONTROLS and not _is_button(control['tag'], attrs):
+        # Typed values are not structure; fields_to_fill compares them separately
+        attrs = {k: v for k, v in attrs.items() if k != 'value'}
+    return (
+        control['type'],
+        tuple(sorted((k, str(v)) for k, v in attrs.items() if k not in VOLATILE_ATTRS)),
+        control['text'],
+        control['label'],
+    )
+
+
+def element_map(snapshot):
+    """{key: control} for every visible control of the snapshot."""
+    return dict(keyed(snapshot.controls))
+
+
+def diff_elements(previous, current):
+    """Element-level diff of two element_map()s."""
+    return {
+        'added': [k for k in current if k not in previous],
+        'removed': [k for k in previous if k not in current],
+        'changed': [k for k in current if k in previous and _signature(current[k]) != _signature(previous[k])],
+    }
+
+
+def _matches_field(control, field_keys):
+    haystack = normalize(" ".join([
+        str(control['attrs'].get(a, '') or '') for a in ('automation_id', 'name', 'id', 'placeholder')
+    ] + [control['label']]))
+    return any(key and key in haystack for key in field_keys)
+
+
+def relevant_changes(diff, elements, field_names=()):
+    """Added or changed elements that can affect the next actions: form controls, buttons, pending fields."""
+    field_keys = [normalize(k) for k in field_names]
+    return [
+        k for k in diff['added'] + diff['changed']
+        if elements[k]['tag'] in FORM_CONTROLS + ('button',) or _matches_field(elements[k], field_keys)
+    ]
+
+
+class SnapshotDelta:
+    """
+    A snapshot restricted to a set of element keys. It has the attributes the
+    summaries read (controls, summary_elements, ui_summary), so it can stand in
+    for the full snapshot when building a prompt.
+    """
+
+    def __init__(self, snapshot, keys):
+        self.snapshot = snapshot
+        self.keys = set(keys)
+        self.controls = [c for k, c in keyed(snapshot.controls) if k in self.keys]
+        lines = list(zip(keyed(snapshot.summary_elements), snapshot.summary_lines))
+        self.summary_elements = [element for (k, element), _ in lines if k in self.keys]
+        self.ui_summary = "\n".join(line for (k, _), line in lines if k in self.keys)
+
+
+class PhaseDiffer:
+    """
+    Keeps the element set of the page the model was last prompted with. focus()
+    returns what the next prompt should see: the whole snapshot the first time,
+    afterwards only the relevant changes plus the pending fields and buttons, and
+    None when nothing relevant changed since the model was asked about the same fields.
+    The caller reports with prompted() when the model was actually asked: a phase
+    answered from the action cache doesn't count.
+    """
+
+    def __init__(self):
+        self.elements = None
+        self.prompted_fields = None
+
+    def focus(self, snapshot, field_names):
+        with span("dom.diff") as s:
+            elements = element_map(snapshot)
+            previous, self.elements = self.elements, elements
+            if previous is None:
+                return snapshot
+
+            diff = diff_elements(previous, elements)
+            relevant = relevant_changes(diff, elements, field_names)
+            s.update({name: len(keys) for name, keys in diff.items()}, relevant=len(relevant))
+            logger.info(f"🧮 DOM diff: +{len(diff['added'])} -{len(diff['removed'])} "
+                        f"~{len(diff['changed'])} ({len(relevant)} relevant)")
+
+            if not relevant and self.prompted_fields == set(field_names):
+                s['skip'] = True
+                return None
+
+            field_keys = [normalize(k) for k in field_names]
+            keys = set(relevant)
+            keys.update(k for k, c in elements.items()
+                        if _is_button(c['tag'], c['attrs']) or _matches_field(c, field_keys))
+            delta = SnapshotDelta(snapshot, keys)
+            if not any(c['tag'] in FORM_CONTROLS and not _is_button(c['tag'], c['attrs']) for c in delta.controls):
+                return snapshot
+            s['focus'] = len(delta.controls)
+            return delta
+
+    def prompted(self, field_names):
+        if field_names:
+            self.prompted_fields = set(field_names)
@@ -0,0 +1,52 @@
+# core/drive.py
+
+import asyncio
+
+# Browser and model steps are written once, as generators: every page call's return
+# value is yielded (the result itself on a sync page, an awaitable on a
+# playwright.async_api page) and so is every blocking call, wrapped in Blocking().
+# drive() runs such a generator for sync pages and drive_async() for async ones; steps
+# compose with `yield from` and read their results back from the yield.
+
+
+class Blocking:
+    """A blocking call (model request, HTML parse) that drive_async() runs in a worker thread."""
+
+    def __init__(self, fn, *args):
+        self.fn = fn
+        self.args = args
+
+
+def drive(steps):
+    """Run a step generator against a sync page and return its result."""
+    value, error = None, None
+    while True:
+        try:
+            step = steps.throw(error) if error is not None else steps.send(value)
+        except StopIteration as done:
+            return done.value
+        value, error = step, None
+        if isinstance(step, Blocking):
+            try:
+                value = step.fn(*step.args)
+            except Exception as e:
+                value, error = None, e  # raised at the yield, like a failed page call
+
+
+async def drive_async(steps):
+    """Run a step generator against a playwright.async_api page: await each yielded call."""
+    value, error = None, None
+    while True:
+        try:
+            step = steps.throw(error) if error is not None else steps.send(value)
+        except StopIteration as done:
+            return done.value
+        try:
+            if isinstance(step, Blocking):
+                value = await asyncio.to_thread(step.fn, *step.args)
+            else:
+                value = await step
+            error = None
+        except Exception as e:
+            # Raised at the yield, so the step's own try/except blocks handle it as on a sync page
+            value, error = None, e
@@ -0,0 +1,164 @@
+# core/executor.py
+
+from core.drive import drive, drive_async
+from core.snapshot import IS_VISIBLE_JS
+from utils.config import ACTION_GRACE_MS, ACTION_TIMEOUT_MS
+from utils.tracing import span
+
+# Runs inside the page: resolves every selector of a batch in one call, fills the
+# plain text inputs directly and reports a status per action. Anything that needs a
+# real input event (clicks, uploads, selects, date pickers...) is left to Playwright
+# and reported as "native"; clicks are only checked for presence (see below).
+EXECUTE_BATCH_SCRIPT = """
+(actions) => {
+    const TEXT_TYPES = ['', 'text', 'password', 'email', 'search', 'tel', 'url', 'number'];
+""" + IS_VISIBLE_JS + """
+    const describe = (el) => ({
+        tag: el.tagName.toLowerCase(),
+        type: (el.getAttribute('type') || '').toLowerCase(),
+        identifiers: [
+            el.getAttribute('automation_id'), el.getAttribute('name'), el.id, el.getAttribute('placeholder'),
+            el.labels && el.labels.length ? el.labels[0].innerText : null,
+        ].filter(Boolean),
+    });
+    const setValue = (el, value) => {
+        const proto = el.tagName === 'TEXTAREA' ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+        const setter = Object.getOwnPropertyDescriptor(proto, 'value').set;
+        el.focus();
+        setter.call(el, value);  // bypasses framework-patched setters so their listeners see the change
+        el.dispatchEvent(new Event('input', {bubbles: true}));
+        el.dispatchEvent(new Event('change', {bubbles: true}));
+    };
+    return actions.map(([kind, selector, value]) => {
+        let el;
+        try {
+            el = document.querySelector(selector);
+        } catch (e) {
+            return {status: 'invalid', error: String(e)};
+        }
+        if (!el) return {status: 'missing'};
+        const element = describe(el);
+        // Present clicks always go to Playwright's page.click, which waits for the element to
+        // be visible and enabled: apps often enable the button in response to this batch's fills
+        if (kind === 'click') return {status: 'native', element};
+        if (!isVisible(el)) return {status: 'hidden', element};
+        if (el.disabled || (kind === 'fill' && el.readOnly)) return {status: 'disabled', element};
+        const inPage = kind === 'fill' && (
+            el.tagName === 'TEXTAREA' || (el.tagName === 'INPUT' && TEXT_TYPES.includes(element.type)));
+        if (!inPage) return {status: 'native', element};
+        try {
+            setValue(el, value);
+        } catch (e) {
+            return {status: 'native', element};
+        }
+        return el.value === value ? {status: 'ok', element} : {status: 'native', element};
+    });
+}
+"""
+
+# Resolves once every selector matches an element, so missing ones get one short grace period
+ALL_PRESENT_SCRIPT = """
+(selectors) => selectors.every((selector) => {
+    try {
+        return document.querySelector(selector) !== null;
+    } catch (e) {
+        return true;
+    }
+})
+"""
+
+FILL_ACTIONS = ('fill', 'type')
+
+
+def split_batches(actions):
+    """
+    Consecutive non-click actions form one batch that ends with the click after
+    them. Fills after a click depend on the page it produces, so they start a new batch.
+    """
+    batches = [[]]
+    for action in actions:
+        batches[-1].append(action)
+        if action['action'].lower() == 'click':
+            batches.append([])
+    return [batch for batch in batches if batch]
+
+
+def _batch_args(batch):
+    kinds = ['fill' if a['action'].lower() in FILL_ACTIONS else a['action'].lower() for a in batch]
+    return [[kind, a['selector'], a.get('value', '')] for kind, a in zip(kinds, batch)]
+
+
+def _merge_probe(statuses, retried, indexes):
+    for i, status in zip(indexes, retried):
+        statuses[i] = status
+    return statuses
+
+
+def _result(action, status):
+    return {'action': action, 'status': status['status'], 'element': status.get('element') or {},
+            'error': status.get('error')}
+
+
+def _missing(batch, statuses):
+    indexes = [i for i, s in enumerate(statuses) if s['status'] == 'missing']
+    return indexes, [batch[i]['selector'] for i in indexes]
+
+
+def _native_steps(page, action, status):
+    """Perform the actions the in-page script left to Playwright."""
+    action_type = action['action'].lower()
+    with span(f"action.{action_type}", selector=action['selector']) as s:
+        try:
+            if action_type == 'click':
+                yield page.click(action['selector'], timeout=ACTION_TIMEOUT_MS)
+            elif action_type in FILL_ACTIONS:
+                yield page.fill(action['selector'], action['value'], timeout=ACTION_TIMEOUT_MS)
+            elif action_type == 'upload':
+                yield page.set_input_files(action['selector'], action['value'], timeout=ACTION_TIMEOUT_MS)
+            else:
+                raise ValueError(f"Unknown action type: {action_type}")
+            status = {'status': 'ok', 'element': status.get('element')}
+        except Exception as e:
+            status = {'status': 'error', 'element': status.get('element'), 'error': str(e)}
+        s['ok'] = status['status'] == 'ok'
+    return status
+
+
+def execute_actions(page, actions, grace_ms=None):
+    """
+    Run the actions batch by batch: one evaluate resolves every selector of the batch
+    and fills its text inputs, then Playwright performs the rest in order with the
+    click last. Missing selectors fail after one short grace wait instead of a full
+    timeout each. Returns one {'action', 'status', 'element', 'error'} per action.
+    """
+    return drive(execute_steps(page, actions, grace_ms))
+
+
+async def execute_actions_async(page, actions, grace_ms=None):
+    """execute_actions() for playwright.async_api pages."""
+    return await drive_async(execute_steps(page, actions, grace_ms))
+
+
+def execute_steps(page, actions, grace_ms=None):
+    """execute_actions() as steps for core.drive."""
+    grace_ms = ACTION_GRACE_MS if grace_ms is None else grace_ms
+    results = []
+    for batch in split_batches(actions):
+        with span("actions.batch", size=len(batch)) as s:
+            args = _batch_args(batch)
+            statuses = yield page.evaluate(EXECUTE_BATCH_SCRIPT, args)
+            indexes, missing = _missing(batch, statuses)
+            if missing and grace_ms:
+                try:
+                    yield page.wait_for_function(ALL_PRESENT_SCRIPT, arg=missing, timeout=grace_ms)
+                except Exception:
+                    pass
+                retried = yield page.evaluate(EXECUTE_BATCH_SCRIPT, [args[i] for i in indexes])
+                statuses = _merge_probe(statuses, retried, indexes)
+            s['in_page'] = sum(1 for st in statuses if st['status'] == 'ok')
+
+        for action, status in zip(batch, statuses):
+            if status['status'] == 'native':
+                status = yield from _native_steps(page, action, status)
+            results.append(_result(action, status))
+    return results
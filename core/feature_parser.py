@@ -1,33 +1,165 @@
 # core/feature_parser.py
 
+import os
 import re
 
-def extract_field_value_map(feature_path, scenario_name):
-    field_map = {}
-    additional_steps = []
+STEP_KEYWORDS = ("Given", "When", "Then", "And", "But", "*")
+SCENARIO_KEYWORDS = ("Scenario Outline:", "Scenario Template:", "Scenario:", "Example:")
+
+# {path: (mtime, feature)} so each file is parsed once per change
+_FEATURE_CACHE = {}
+
+
+def _split_row(line):
+    return [cell.strip() for cell in line.strip().strip("|").split("|")]
+
+
+def _substitute(text, row):
+    for key, value in row.items():
+        text = text.replace(f"<{key}>", value)
+    return text
+
+
+def _expand_outline(outline):
+    """One concrete scenario per Examples row, with <placeholders> filled in."""
+    concrete = []
+    number = 0
+    for examples in outline['examples']:
+        if not examples['rows']:
+            continue
+        header, rows = examples['rows'][0], examples['rows'][1:]
+        for values in rows:
+            number += 1
+            row = dict(zip(header, values))
+            name = _substitute(outline['name'], row)
+            if name == outline['name']:
+                name = f"{outline['name']} (example {number})"
+            concrete.append({
+                'name': name,
+                'tags': outline['tags'] + examples['tags'],
+                'steps': [_substitute(step, row) for step in outline['steps']],
+                'outline': outline['name'],
+                'example': row,
+            })
+    return concrete
+
+
+def _parse_lines(lines, path):
+    feature = {'path': path, 'name': '', 'tags': [], 'background': [], 'scenarios': []}
+    pending_tags = []
+    current = None       # dict collecting steps: background, scenario or outline
+    examples = None      # Examples block of the current outline
+    in_docstring = False
+
+    for raw in lines:
+        line = raw.strip()
+        if line.startswith('"""') or line.startswith("```"):
+            in_docstring = not in_docstring
+            continue
+        if in_docstring or not line or line.startswith("#"):
+            continue
+
+        if line.startswith("@"):
+            pending_tags.extend(tag for tag in line.split() if tag.startswith("@"))
+        elif line.startswith("Feature:"):
+            feature['name'] = line[len("Feature:"):].strip()
+            feature['tags'], pending_tags = pending_tags, []
+        elif line.startswith("Background:"):
+            current, examples = {'steps': feature['background']}, None
+        elif line.startswith(SCENARIO_KEYWORDS):
+            keyword = next(k for k in SCENARIO_KEYWORDS if line.startswith(k))
+            current = {
+                'name': line[len(keyword):].strip(),
+                'tags': feature['tags'] + pending_tags,
+                'steps': [],
+                'examples': [],
+                'is_outline': keyword in ("Scenario Outline:", "Scenario Template:"),
+            }
+            pending_tags, examples = [], None
+            feature['scenarios'].append(current)
+        elif line.startswith(("Examples:", "Scenarios:")) and current is not None and 'examples' in current:
+            examples = {'tags': pending_tags, 'rows': []}
+            pending_tags = []
+            current['examples'].append(examples)
+        elif line.startswith("|"):
+            if examples is not None:
+                examples['rows'].append(_split_row(line))
+            # Step data tables are not used for field extraction
+        elif current is not None and line.split(" ", 1)[0] in STEP_KEYWORDS:
+            current['steps'].append(line)
+
+    scenarios = []
+    for scenario in feature['scenarios']:
+        if scenario['is_outline']:
+            scenarios.extend(_expand_outline(scenario))
+        else:
+            scenarios.append({'name': scenario['name'], 'tags': scenario['tags'], 'steps': scenario['steps'],
+                              'outline': None, 'example': None})
+    feature['scenarios'] = scenarios
+    feature['index'] = {scenario['name']: scenario for scenario in scenarios}
+    return feature
 
+
+def parse_feature(feature_path):
+    """
+    Parse a .feature file into {'name', 'tags', 'background', 'scenarios', 'index'}.
+    Scenario Outlines are expanded into one concrete scenario per Examples row.
+    Results are cached by path and mtime.
+    """
+    mtime = os.path.getmtime(feature_path)
+    cached = _FEATURE_CACHE.get(feature_path)
+    if cached and cached[0] == mtime:
+        return cached[1]
     with open(feature_path, "r") as file:
-        recording = False
-        for line in file:
-            line = line.strip()
+        feature = _parse_lines(file, feature_path)
+    _FEATURE_CACHE[feature_path] = (mtime, feature)
+    return feature
 
-            if line.startswith("Scenario:") and scenario_name in line:
-                recording = True
-                continue
-            elif line.startswith("Scenario:") and recording:
-                break
-
-            if recording:
-                # Match: enter <field> as <value> or enters <field> as <value>
-                match = re.search(r'enter(?:s)?\s+"?([^"]+)"?\s+as\s+"?([^"]+)"?', line, re.IGNORECASE)
-                if match:
-                    field = match.group(1).strip().lower().replace(" ", "")
-                    value = match.group(2).strip()
-                    field_map[field] = value
-                elif "click on" in line.lower():
-                    button = line.split("click on")[-1].strip().strip('"')
-                    additional_steps.append(f'Click on the button labeled "{button}"')
-                else:
-                    additional_steps.append(line)
+
+def find_scenario(feature_path, scenario_name):
+    """Exact name match first, then the first scenario whose name contains scenario_name."""
+    feature = parse_feature(feature_path)
+    scenario = feature['index'].get(scenario_name.strip())
+    if scenario is None:
+        scenario = next((s for s in feature['scenarios'] if scenario_name in s['name']), None)
+    return scenario
+
+
+def field_value_map_from_steps(steps):
+    field_map = {}
+    additional_steps = []
+
+    for line in steps:
+        # Match: enter <field> as <value> or enters <field> as <value>
+        match = re.search(r'enter(?:s)?\s+"?([^"]+)"?\s+as\s+"?([^"]+)"?', line, re.IGNORECASE)
+        if match:
+            field = match.group(1).strip().lower().replace(" ", "")
+            value = match.group(2).strip()
+            field_map[field] = value
+        elif "click on" in line.lower():
+            button = line.split("click on")[-1].strip().strip('"')
+            additional_steps.append(f'Click on the button labeled "{button}"')
+        else:
+            additional_steps.append(line)
 
     return field_map, ", then ".join(additional_steps)
+
+
+def extract_field_value_map(feature_path, scenario_name):
+    scenario = find_scenario(feature_path, scenario_name)
+    if scenario is None:
+        return {}, ""
+    return field_value_map_from_steps(parse_feature(feature_path)['background'] + scenario['steps'])
+
+
+def discover_scenarios(features_dir="features"):
+    """Returns [(feature_path, scenario_name), ...] for every concrete scenario under features_dir."""
+    scenarios = []
+    for root, _, files in os.walk(features_dir):
+        for name in sorted(files):
+            if not name.endswith(".feature"):
+                continue
+            path = os.path.join(root, name)
+            for scenario in parse_feature(path)['scenarios']:
+                scenarios.append((path, scenario['name']))
+    return sorted(scenarios)
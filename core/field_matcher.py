@@ -0,0 +1,135 @@
+# core/field_matcher.py
+
+import re
+from core.summary import normalize
+
+# Which element attributes identify a field, and how much a match on each counts
+IDENTIFIER_WEIGHTS = {'automation_id': 5, 'id': 4, 'name': 4, 'label': 3, 'placeholder': 2}
+MAX_NGRAM = 4
+
+_WORDS = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+')
+
+
+def tokens(text):
+    """'txt_clientLoginUserName' -> ['txt', 'client', 'login', 'user', 'name']"""
+    return [word.lower() for word in _WORDS.findall(text or '')]
+
+
+def ngrams(words, max_n=MAX_NGRAM):
+    """Every run of up to max_n consecutive words, joined: user, name, username, ..."""
+    return {
+        "".join(words[i:j])
+        for i in range(len(words))
+        for j in range(i + 1, min(len(words), i + max_n) + 1)
+    }
+
+
+def _identifiers(control):
+    attrs = control['attrs']
+    found = {attr: attrs.get(attr) for attr in IDENTIFIER_WEIGHTS if attr != 'label' and attrs.get(attr)}
+    if control.get('label'):
+        found['label'] = control['label']
+    return found
+
+
+def _score(key, attr, full):
+    """Heavier attributes first; an identifier that is exactly the field beats one that merely contains it."""
+    score = IDENTIFIER_WEIGHTS[attr]
+    if key == full:
+        score += 10
+    elif full:
+        score += 5 * len(key) / len(full)
+    return score
+
+
+class FieldIndex:
+    """
+    Visible inputs of one snapshot, indexed by the normalized word n-grams of their
+    name, id, automation_id, placeholder and label, so looking a field up is a
+    dict access instead of a scan over every identifier.
+    """
+
+    def __init__(self, snapshot):
+        self.entries = []
+        self.by_token = {}
+        for control in snapshot.controls:
+            if control['tag'] not in ('input', 'select', 'textarea') or control['type'] in ('submit', 'button'):
+                continue
+            attrs = control['attrs']
+            identifier = (attrs.get('automation_id') or attrs.get('name') or attrs.get('id')
+                          or attrs.get('placeholder') or '').strip()
+            identifiers = _identifiers(control)
+            entry = {
+                'identifier': identifier,
+                'tag': control['tag'],
+                'type': control['type'],
+                'attrs': attrs,
+                'value': snapshot.input_values.get(identifier, ''),
+                'normalized': {attr: normalize(text) for attr, text in identifiers.items()},
+            }
+            index = len(self.entries)
+            self.entries.append(entry)
+            for attr, text in identifiers.items():
+                for token in ngrams(tokens(text)) | {entry['normalized'][attr]}:
+                    self.by_token.setdefault(token, []).append((index, attr))
+
+    def candidates(self, key):
+        """[(score, entry index)] for a normalized field key, best first."""
+        best = {}
+        for index, attr in self.by_token.get(key, ()):
+            score = _score(key, attr, self.entries[index]['normalized'][attr])
+            best[index] = max(best.get(index, 0), score)
+        if not best:
+            # Identifiers that don't split into words (e.g. 'usrname1'): plain substring, ranked lower
+            for index, entry in enumerate(self.entries):
+                for attr, full in entry['normalized'].items():
+                    if key and key in full:
+                        best[index] = max(best.get(index, 0), _score(key, attr, full) / 2)
+        # Equal scores go to the element that comes first on the page
+        return sorted(((score, index) for index, score in best.items()), key=lambda c: (-c[0], c[1]))
+
+
+class FieldMatcher:
+    """
+    Built once per scenario: normalizes the feature's field keys up front and
+    resolves them against each phase's FieldIndex. When several fields could
+    match the same element (name / username), the best-scoring pair wins and
+    each element is given to one field only.
+    """
+
+    def __init__(self, field_values):
+        self.field_values = dict(field_values)
+        self.keys = {field: normalize(field) for field in self.field_values}
+        self._index = (None, None)
+
+    def index(self, snapshot):
+        if self._index[0] is not snapshot:
+            self._index = (snapshot, FieldIndex(snapshot))
+        return self._index[1]
+
+    def match(self, snapshot, fields=None):
+        """{field: entry} for the given fields (default: all) that have a visible input."""
+        index = self.index(snapshot)
+        pairs = []
+        for field in (self.field_values if fields is None else fields):
+            for score, entry in index.candidates(self.keys.get(field) or normalize(field)):
+                pairs.append((score, field, entry))
+        matched, taken = {}, set()
+        for score, field, entry in sorted(pairs, key=lambda p: (-p[0], p[2])):
+            if field not in matched and entry not in taken:
+                matched[field] = index.entries[entry]
+                taken.add(entry)
+        return matched
+
+    def candidates(self, snapshot, field):
+        """Every visible input that could be `field`, best first."""
+        index = self.index(snapshot)
+        return [index.entries[i] for _, i in index.candidates(self.keys.get(field) or normalize(field))]
+
+    def field_for(self, identifiers):
+        """The field an element with these identifiers (name, id, label...) belongs to, or None."""
+        grams = set()
+        for text in identifiers:
+            grams |= ngrams(tokens(text)) | {normalize(text)}
+        hits = [field for field, key in self.keys.items() if key in grams]
+        return max(hits, key=lambda field: len(self.keys[field])) if hits else None
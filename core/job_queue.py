@@ -0,0 +1,163 @@
+# core/job_queue.py
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from utils.config import JOB_QUEUE_DIR, WORKER_HEARTBEAT_S, WORKER_STALE_S
+from utils.logger import get_logger
+
+logger = get_logger()
+
+STATES = ('pending', 'running', 'done')
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _write_json(path, data):
+    tmp = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)  # readers never see a half-written file
+
+
+class JobQueue:
+    """
+    Spool-directory queue: a job is one JSON file that moves pending/ -> running/ -> done/.
+    A rename is atomic, so any process can submit and several workers (on any host that
+    mounts the directory) can share a queue without taking the same job twice. Job ids
+    start with the submit time in µs, so pending jobs run oldest first. A running job's
+    file records its worker's host and pid and a heartbeat the worker keeps refreshing;
+    recover() hands a job back to pending/ when its heartbeat is stale or its worker
+    is known to be gone.
+    """
+
+    def __init__(self, root=JOB_QUEUE_DIR):
+        self.root = root
+        for state in STATES:
+            os.makedirs(os.path.join(root, state), exist_ok=True)
+
+    def _path(self, state, name):
+        return os.path.join(self.root, state, name)
+
+    def _names(self, state):
+        return sorted(n for n in os.listdir(os.path.join(self.root, state))
+                      if n.endswith(".json") and not n.startswith("."))
+
+    def submit(self, target, **fields):
+        """Queue `target` (a shortcut name or path.feature::Scenario); returns the job id."""
+        job = {'id': f"{time.time_ns() // 1000:016d}-{uuid.uuid4().hex[:6]}", 'target': target,
+               'submitted': time.time(), **fields}
+        _write_json(self._path('pending', f"{job['id']}.json"), job)
+        return job['id']
+
+    def claim(self):
+        """Move the oldest pending job to running/ and return it, or None if there is none."""
+        for name in self._names('pending'):
+            running = self._path('running', name)
+            try:
+                os.rename(self._path('pending', name), running)
+            except FileNotFoundError:
+                continue  # another worker got it first
+            try:
+                with open(running, "r") as f:
+                    job = json.load(f)
+            except ValueError as e:
+                job = {'id': name[:-len(".json")], 'target': None, 'error': f"unreadable job file: {e}"}
+            job['worker'] = {'host': socket.gethostname(), 'pid': os.getpid()}
+            job['claimed'] = job['heartbeat'] = time.time()
+            _write_json(running, job)
+            return job
+
+    def _owns(self, job):
+        """Whether the running file is still this worker's (recover() may have requeued it)."""
+        try:
+            with open(self._path('running', f"{job['id']}.json"), "r") as f:
+                return json.load(f).get('worker') == job['worker']
+        except (OSError, ValueError):
+            return False
+
+    def heartbeat(self, job):
+        if self._owns(job):
+            job['heartbeat'] = time.time()
+            _write_json(self._path('running', f"{job['id']}.json"), job)
+
+    @contextmanager
+    def keep_alive(self, job, interval=WORKER_HEARTBEAT_S):
+        """Refresh the job's heartbeat every `interval` seconds while it runs."""
+        done = threading.Event()
+
+        def beat():
+            while not done.wait(interval):
+                self.heartbeat(job)
+
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            yield job
+        finally:
+            done.set()
+            thread.join()
+
+    def finish(self, job, result):
+        owned = self._owns(job)
+        _write_json(self._path('done', f"{job['id']}.json"), {**job, 'finished': time.time(), 'result': result})
+        if owned:
+            try:
+                os.remove(self._path('running', f"{job['id']}.json"))
+            except OSError:
+                pass
+
+    def result(self, job_id):
+        """The finished job (with its 'result'), or None while it is pending or running."""
+        try:
+            with open(self._path('done', f"{job_id}.json"), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _orphaned(self, path, now, host):
+        try:
+            with open(path, "r") as f:
+                job = json.load(f)
+        except ValueError:
+            job = {}
+        worker = job.get('worker') or {}
+        # Not yet stamped by claim(): the rename that moved it here set its ctime
+        heartbeat = job.get('heartbeat') or os.stat(path).st_ctime
+        if now - heartbeat > WORKER_STALE_S:
+            return True  # also covers other hosts, and a pid reused by an unrelated process
+        return worker.get('host') == host and bool(worker.get('pid')) and not pid_alive(worker['pid'])
+
+    def recover(self):
+        """Requeue jobs whose worker died or stopped sending heartbeats; returns how many."""
+        now, host = time.time(), socket.gethostname()
+        recovered = 0
+        for name in self._names('running'):
+            path = self._path('running', name)
+            try:
+                if self._orphaned(path, now, host):
+                    os.rename(path, self._path('pending', name))
+                    recovered += 1
+            except OSError:
+                pass  # finished or requeued meanwhile
+        if recovered:
+            logger.info(f"♻️ Requeued {recovered} jobs left running by a stopped worker")
+        return recovered
+
+    def depth(self):
+        return len(self._names('pending'))
+
+    def running(self):
+        return len(self._names('running'))
@@ -0,0 +1,292 @@
+# core/llm.py
+
+import hashlib
+import itertools
+import json
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from utils.config import (
+    LLM_BACKOFF_BASE_S, LLM_BACKOFF_MAX_S, LLM_MAX_IN_FLIGHT, LLM_MAX_RETRIES, LLM_TIMEOUT_S,
+    LLM_TOKENS_PER_MINUTE,
+)
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# Tokens reserved for the reply until the real usage is known
+COMPLETION_RESERVE = 512
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+_client = None
+_gateway = None
+_lock = threading.Lock()
+
+
+def get_client():
+    """
+    The shared OpenAI client, built on first use. Importing the SDK and reading the
+    API key are deferred until a model call is actually made. Retries are left to
+    the gateway, so the SDK's own are turned off.
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                from openai import OpenAI
+                from utils.environment import load_env
+                _client = OpenAI(api_key=load_env(), timeout=LLM_TIMEOUT_S, max_retries=0)
+    return _client
+
+
+def set_client(client):
+    """Replace the shared client (benchmarks and dry runs pass a fake); None resets it."""
+    global _client
+    with _lock:
+        _client = client
+
+
+def get_gateway():
+    global _gateway
+    if _gateway is None:
+        with _lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
+
+
+def set_token_budget(tokens_per_minute):
+    """Change this process's tokens-per-minute limit (0 = none); scenarios already waiting pick it up."""
+    budget = get_gateway().budget
+    with budget.cond:
+        budget.limit = tokens_per_minute
+        budget.cond.notify_all()
+
+
+class TokenBudget:
+    """
+    Sliding one-minute window of tokens sent. acquire() blocks until the estimate
+    fits, and settle() swaps the estimate for the real usage once it is known.
+    """
+
+    def __init__(self, tokens_per_minute, window=60.0):
+        self.limit = tokens_per_minute
+        self.window = window
+        self.entries = deque()  # [timestamp, tokens]
+        self.cond = threading.Condition()
+
+    def used(self, now=None):
+        now = time.monotonic() if now is None else now
+        while self.entries and self.entries[0][0] <= now - self.window:
+            self.entries.popleft()
+        return sum(tokens for _, tokens in self.entries)
+
+    def acquire(self, tokens):
+        with self.cond:
+            if self.limit:
+                tokens = min(tokens, self.limit)
+                while True:
+                    now = time.monotonic()
+                    if self.used(now) + tokens <= self.limit:
+                        break
+                    self.cond.wait(max(0.05, self.entries[0][0] + self.window - now))
+            entry = [time.monotonic(), tokens]
+            self.entries.append(entry)
+            return entry
+
+    def settle(self, entry, tokens):
+        with self.cond:
+            entry[1] = tokens
+            self.cond.notify_all()
+
+
+def _total_tokens(response):
+    return _usage_tokens(getattr(response, "usage", None))
+
+
+def _usage_tokens(usage):
+    if usage is None:
+        return None
+    return getattr(usage, "total_tokens", None) or (usage.prompt_tokens or 0) + (usage.completion_tokens or 0)
+
+
+def _retry_delay(error, attempt):
+    """Seconds to wait before retrying `error`, or None if it is not worth retrying."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        import openai
+        if not isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+            return None
+    elif status not in RETRY_STATUSES:
+        return None
+
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        if retry_after is not None:
+            return min(float(retry_after), LLM_BACKOFF_MAX_S)
+    except ValueError:
+        pass
+    # Full jitter: spreads retries from concurrent scenarios instead of synchronising them
+    return random.uniform(0, min(LLM_BACKOFF_MAX_S, LLM_BACKOFF_BASE_S * 2 ** attempt))
+
+
+class LLMGateway:
+    """
+    Every model call in the process goes through here so concurrent scenarios share
+    one connection pool and one rate limit: at most `max_in_flight` requests at a
+    time, a tokens-per-minute budget, backoff with jitter on 429/5xx, and identical
+    prompts already in flight wait for that request instead of sending another.
+    """
+
+    def __init__(self, max_in_flight=LLM_MAX_IN_FLIGHT, tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+                 max_retries=LLM_MAX_RETRIES):
+        self.slots = threading.BoundedSemaphore(max(1, max_in_flight))
+        self.budget = TokenBudget(tokens_per_minute)
+        self.max_retries = max_retries
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'deduped': 0, 'throttled_ms': 0.0}
+
+    def _count(self, **deltas):
+        with self.lock:
+            for name, delta in deltas.items():
+                self.stats[name] += delta
+
+    def chat(self, model, messages, temperature=0, estimated_tokens=0, attrs=None):
+        """Returns the chat completion response. `attrs` (a span's dict) receives attempts/queueing info."""
+        attrs = attrs if attrs is not None else {}
+        key = hashlib.sha256(json.dumps([model, messages, temperature], sort_keys=True).encode("utf-8")).hexdigest()
+        with self.lock:
+            leader = self.inflight.get(key)
+            if leader is None:
+                future = self.inflight[key] = Future()
+            else:
+                self.stats['deduped'] += 1
+        if leader is not None:
+            attrs['deduped'] = True
+            return leader.result()
+
+        try:
+            response = self._send(model, messages, temperature, estimated_tokens, attrs)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+
+    def stream(self, model, messages, temperature=0, estimated_tokens=0, attrs=None):
+        """
+        Yields the reply's text as it arrives, under the same slots, budget and retries as
+        chat(). The HTTP stream is read by a background thread that holds the slot only
+        while reading, so whatever the caller does between chunks (filling fields) never
+        keeps a slot or the connection busy. Retries stop once the first chunk is in: a
+        stream that breaks after that raises to the caller, which may already have acted
+        on part of it. Identical prompts are not deduplicated.
+        """
+        attrs = attrs if attrs is not None else {}
+        chunks = queue.Queue()
+        cancelled = threading.Event()
+        reader = threading.Thread(target=self._read_stream, daemon=True,
+                                  args=(model, messages, temperature, estimated_tokens, attrs, chunks, cancelled))
+        reader.start()
+        try:
+            while True:
+                kind, item = chunks.get()
+                if kind == 'text':
+                    yield item
+                elif kind == 'error':
+                    raise item
+                else:
+                    break
+        finally:
+            cancelled.set()  # the caller stopped early: let the reader drop the connection
+        reader.join()
+
+    def _read_stream(self, model, messages, temperature, estimated_tokens, attrs, chunks, cancelled):
+        attempt = 0
+        try:
+            while True:
+                start = time.perf_counter()
+                entry = self.budget.acquire(estimated_tokens + COMPLETION_RESERVE)
+                with self.slots:
+                    queued_ms = (time.perf_counter() - start) * 1000
+                    attrs['queued_ms'] = round(attrs.get('queued_ms', 0) + queued_ms, 3)
+                    self._count(throttled_ms=queued_ms, requests=1)
+                    sent = time.perf_counter()
+                    try:
+                        response = get_client().chat.completions.create(
+                            model=model, messages=messages, temperature=temperature, stream=True,
+                            stream_options={"include_usage": True}
+                        )
+                        parts = iter(response)
+                        first = next(parts, None)
+                    except Exception as e:
+                        self.budget.settle(entry, 0)
+                        error = e
+                    else:
+                        attrs['attempts'] = attempt + 1
+                        attrs['first_chunk_ms'] = round((time.perf_counter() - sent) * 1000, 3)
+                        usage = None
+                        try:
+                            for chunk in itertools.chain([first] if first is not None else [], parts):
+                                if cancelled.is_set():
+                                    getattr(response, "close", lambda: None)()
+                                    break
+                                usage = getattr(chunk, "usage", None) or usage
+                                if chunk.choices and chunk.choices[0].delta.content:
+                                    chunks.put(('text', chunk.choices[0].delta.content))
+                        finally:
+                            if usage is not None:
+                                attrs['prompt_tokens'] = usage.prompt_tokens
+                                attrs['completion_tokens'] = usage.completion_tokens
+                            self.budget.settle(entry, _usage_tokens(usage) or estimated_tokens)
+                        chunks.put(('done', None))
+                        return
+
+                delay = _retry_delay(error, attempt) if attempt < self.max_retries else None
+                if delay is None:
+                    attrs['attempts'] = attempt + 1
+                    raise error
+                attempt += 1
+                self._count(retries=1)
+                logger.warning(f"🔁 LLM stream failed ({error}); retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+        except BaseException as e:
+            chunks.put(('error', e))
+
+    def _send(self, model, messages, temperature, estimated_tokens, attrs):
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            entry = self.budget.acquire(estimated_tokens + COMPLETION_RESERVE)
+            with self.slots:
+                queued_ms = (time.perf_counter() - start) * 1000
+                attrs['queued_ms'] = round(attrs.get('queued_ms', 0) + queued_ms, 3)
+                self._count(throttled_ms=queued_ms, requests=1)
+                try:
+                    response = get_client().chat.completions.create(
+                        model=model, messages=messages, temperature=temperature
+                    )
+                except Exception as e:
+                    self.budget.settle(entry, 0)  # rejected requests are not billed against the limit
+                    error = e
+                else:
+                    self.budget.settle(entry, _total_tokens(response) or estimated_tokens)
+                    attrs['attempts'] = attempt + 1
+                    return response
+
+            delay = _retry_delay(error, attempt) if attempt < self.max_retries else None
+            if delay is None:
+                attrs['attempts'] = attempt + 1
+                raise error
+            attempt += 1
+            self._count(retries=1)
+            logger.warning(f"🔁 LLM request failed ({error}); retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            time.sleep(delay)
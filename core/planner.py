@@ -0,0 +1,130 @@
+# core/planner.py
+
+from core.agent import complete, get_ui_summary, parse_json_output
+from core.drive import Blocking, drive, drive_async
+from core.snapshot import IS_VISIBLE_JS
+from utils.logger import get_logger
+from utils.tracing import span
+
+logger = get_logger()
+
+# Returns, for each selector, whether it matches a visible element on the current page.
+VISIBLE_SELECTORS_SCRIPT = """
+(selectors) => {
+""" + IS_VISIBLE_JS + """
+    return selectors.map((selector) => {
+        try {
+            const el = document.querySelector(selector);
+            return el !== null && isVisible(el);
+        } catch (e) {
+            return false;
+        }
+    });
+}
+"""
+
+
+def build_plan_prompt(ui_summary, field_values, additional_goal):
+    field_instructions = "\n".join([
+        f'- Field "{k}" MUST be filled with exactly: "{v}"' for k, v in field_values.items()
+    ])
+    goal = f"{field_instructions}\nThen: {additional_goal}" if additional_goal else field_instructions
+
+    return f"""
+You are an intelligent browser automation agent.
+
+Below is the current HTML structure of a web page under test. The whole flow may span several
+screens (for example the password field may only appear after the username step). Plan ALL the
+remaining steps now, as a list of stages. A stage runs when every selector in "when_visible" is
+visible on the page; its actions are then performed in order.
+
+HTML content:
+{ui_summary}
+
+User wants to:
+{goal}
+
+⚠️ IMPORTANT:
+- DO NOT invent or guess any values. Use ONLY the values provided.
+- The first stage must only use elements that appear in the HTML above.
+- For later screens, use the most likely stable CSS selectors (id, name, automation_id).
+- Return ONLY a JSON array in this format:
+
+[
+  {{
+    "when_visible": ["<valid CSS selector>", ...],
+    "actions": [
+      {{"action": "fill" | "click" | "upload", "selector": "<valid CSS selector>", "value": "<value>"}}
+    ]
+  }},
+  ...
+]
+
+DO NOT include any explanation or extra text.
+"""
+
+
+class BatchedPlanner:
+    """
+    Asks the model once for a conditional plan covering every remaining field and
+    goal step, then replays stages as the page matches them. The model is only
+    consulted again when no pending stage matches the current page.
+    """
+
+    def __init__(self, field_values, additional_goal, max_calls=2):
+        self.field_values = field_values
+        self.additional_goal = additional_goal
+        self.max_calls = max_calls
+        self.calls = 0
+        self.stages = []
+
+    def _prompt(self, snapshot, pending_fields):
+        remaining = {k: v for k, v in self.field_values.items() if k in pending_fields}
+        ui_summary = get_ui_summary(snapshot, field_names=remaining)
+        with span("prompt.build", kind="plan"):
+            return build_plan_prompt(ui_summary, remaining, self.additional_goal)
+
+    def _set_plan(self, plan):
+        self.calls += 1
+        self.stages = [
+            {'when_visible': list(stage.get('when_visible') or []), 'actions': list(stage.get('actions') or [])}
+            for stage in plan if isinstance(stage, dict)
+        ]
+        logger.info(f"🗺️ Plan #{self.calls} with {len(self.stages)} stages")
+
+    def _candidate_selectors(self):
+        return sorted({sel for stage in self.stages for sel in stage['when_visible']})
+
+    def _take_stage(self, visible):
+        for i, stage in enumerate(self.stages):
+            if all(visible.get(sel) for sel in stage['when_visible']):
+                return self.stages.pop(i)
+        return None
+
+    def needs_plan(self, pending_fields):
+        return pending_fields and self.calls < self.max_calls
+
+    def next_actions(self, page, snapshot, pending_fields):
+        return drive(self.next_actions_steps(page, snapshot, pending_fields))
+
+    async def next_actions_async(self, page, snapshot, pending_fields):
+        return await drive_async(self.next_actions_steps(page, snapshot, pending_fields))
+
+    def next_actions_steps(self, page, snapshot, pending_fields):
+        """next_actions() as steps for core.drive; the model call runs off the event loop."""
+        if self.calls == 0:
+            self._set_plan(parse_json_output((yield Blocking(complete, self._prompt(snapshot, pending_fields)))))
+        stage = yield from self._match_steps(page)
+        if stage is None and self.needs_plan(pending_fields):
+            logger.info("🗺️ Page no longer matches the plan, re-planning")
+            self._set_plan(parse_json_output((yield Blocking(complete, self._prompt(snapshot, pending_fields)))))
+            stage = yield from self._match_steps(page)
+        return stage['actions'] if stage else []
+
+    def _match_steps(self, page):
+        selectors = self._candidate_selectors()
+        with span("plan.match"):
+            visible = {}
+            if selectors:
+                visible = dict(zip(selectors, (yield page.evaluate(VISIBLE_SELECTORS_SCRIPT, selectors))))
+        return self._take_stage(visible)
@@ -0,0 +1,242 @@
+# core/result_store.py
+
+import functools
+import hashlib
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+import zlib
+from utils.config import RESULTS_BUILD, RESULTS_DIR, RESULTS_ENABLED
+from utils.logger import get_logger
+from utils.tracing import current_tracer
+
+logger = get_logger()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    scenario TEXT NOT NULL,
+    build TEXT,
+    started REAL,
+    duration REAL,
+    passed INTEGER,
+    phases INTEGER,
+    llm_calls INTEGER,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    actions INTEGER,
+    failed_actions INTEGER,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS phases (
+    run_id INTEGER NOT NULL,
+    phase INTEGER NOT NULL,
+    duration REAL,
+    llm_calls INTEGER,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    actions INTEGER,
+    failed_actions INTEGER,
+    html_hash TEXT,
+    PRIMARY KEY (run_id, phase)
+);
+CREATE TABLE IF NOT EXISTS actions (
+    run_id INTEGER NOT NULL,
+    phase INTEGER NOT NULL,
+    action TEXT,
+    selector TEXT,
+    status TEXT,
+    cached INTEGER
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    hash TEXT PRIMARY KEY,
+    size INTEGER,
+    html BLOB
+);
+CREATE INDEX IF NOT EXISTS runs_scenario ON runs (scenario, started);
+CREATE INDEX IF NOT EXISTS actions_selector ON actions (selector, status);
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def current_build():
+    """RESULTS_BUILD / CI build number, else the short git revision, else 'local'."""
+    if RESULTS_BUILD:
+        return RESULTS_BUILD
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=2).stdout.strip() or "local"
+    except Exception:
+        return "local"
+
+
+def phase_mark():
+    """Taken when a phase starts; phase_detail() measures the phase from it."""
+    tracer = current_tracer()
+    return time.perf_counter(), len(tracer.spans) if tracer else 0
+
+
+def phase_detail(phase, mark, results):
+    """Per-phase row for the store: duration, LLM usage from the trace spans, executor results."""
+    started, span_index = mark
+    tracer = current_tracer()
+    calls, prompt_tokens, completion_tokens = tracer.llm_usage(span_index) if tracer else (0, 0, 0)
+    return {
+        'phase': phase,
+        'duration': round(time.perf_counter() - started, 3),
+        'llm_calls': calls,
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'actions': [{
+            'action': r['action'].get('action'),
+            'selector': r['action'].get('selector'),
+            'status': r['status'],
+            'cached': r['action'].get('cached'),
+        } for r in results],
+    }
+
+
+def html_hash(html):
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+
+class ResultStore:
+    """
+    One row per scenario run with its phases, actions and the phase HTML. HTML is
+    zlib-compressed and stored once per content hash, so identical pages across
+    runs cost nothing extra. WAL mode lets suite worker processes write at once.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(RESULTS_DIR, "results.db")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def _store_html(self, html):
+        digest = html_hash(html)
+        self._conn.execute(
+            "INSERT OR IGNORE INTO snapshots (hash, size, html) VALUES (?, ?, ?)",
+            (digest, len(html), zlib.compress(html.encode("utf-8"), 6))
+        )
+        return digest
+
+    def store_html(self, html):
+        """Persist one page now (run_phases' html_sink) and return its hash for the phase row."""
+        with self._lock:
+            digest = self._store_html(html)
+            self._conn.commit()
+        return digest
+
+    def record_run(self, scenario, result, phase_htmls=None, build=None):
+        """Store a run_phases()/run_agent() result; returns the run id."""
+        details = result.get('phase_details') or []
+        phase_htmls = phase_htmls or {}
+        actions = [a for d in details for a in d['actions']]
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO runs (scenario, build, started, duration, passed, phases, llm_calls, prompt_tokens, "
+                "completion_tokens, actions, failed_actions, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (scenario, build or current_build(), result.get('started', time.time()), result.get('duration'),
+                 int(bool(result.get('passed'))), result.get('phases'),
+                 sum(d['llm_calls'] for d in details), sum(d['prompt_tokens'] for d in details),
+                 sum(d['completion_tokens'] for d in details),
+                 len(actions), sum(1 for a in actions if a['status'] != 'ok'), result.get('error'))
+            )
+            run_id = cur.lastrowid
+            for d in details:
+                html = phase_htmls.get(d['phase'])
+                digest = self._store_html(html) if html else d.get('html_hash')
+                self._conn.execute(
+                    "INSERT INTO phases VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (run_id, d['phase'], d['duration'], d['llm_calls'], d['prompt_tokens'], d['completion_tokens'],
+                     len(d['actions']), sum(1 for a in d['actions'] if a['status'] != 'ok'),
+                     digest)
+                )
+                self._conn.executemany(
+                    "INSERT INTO actions VALUES (?, ?, ?, ?, ?, ?)",
+                    [(run_id, d['phase'], a['action'], a['selector'], a['status'], int(bool(a.get('cached'))))
+                     for a in d['actions']]
+                )
+            self._conn.commit()
+        return run_id
+
+    def query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def slowest_phases(self, limit=10, scenario=None):
+        """Phases by average duration: (scenario, phase, runs, avg s, max s, avg LLM calls)."""
+        where, params = ("WHERE r.scenario LIKE ?", (f"%{scenario}%",)) if scenario else ("", ())
+        return self.query(
+            "SELECT r.scenario, p.phase, COUNT(*), AVG(p.duration), MAX(p.duration), AVG(p.llm_calls) "
+            f"FROM phases p JOIN runs r ON r.id = p.run_id {where} "
+            "GROUP BY r.scenario, p.phase ORDER BY AVG(p.duration) DESC LIMIT ?", params + (limit,)
+        )
+
+    def retried_selectors(self, limit=10, scenario=None):
+        """Selectors attempted in more than one phase of a run, or failing: (selector, attempts, failures, runs)."""
+        where, params = ("WHERE r.scenario LIKE ?", (f"%{scenario}%",)) if scenario else ("", ())
+        return self.query(
+            "SELECT a.selector, COUNT(*) AS attempts, SUM(a.status != 'ok') AS failures, COUNT(DISTINCT a.run_id) "
+            f"FROM actions a JOIN runs r ON r.id = a.run_id {where} GROUP BY a.selector "
+            "HAVING attempts > COUNT(DISTINCT a.run_id) OR failures > 0 "
+            "ORDER BY failures DESC, attempts DESC LIMIT ?", params + (limit,)
+        )
+
+    def build_trends(self, limit=20, scenario=None):
+        """Per build, oldest first: (build, runs, pass rate, avg s, avg LLM calls, avg tokens)."""
+        where, params = ("WHERE scenario LIKE ?", (f"%{scenario}%",)) if scenario else ("", ())
+        rows = self.query(
+            "SELECT build, COUNT(*), AVG(passed), AVG(duration), AVG(llm_calls), "
+            "AVG(prompt_tokens + completion_tokens), MIN(started) AS first "
+            f"FROM runs {where} GROUP BY build ORDER BY first DESC LIMIT ?", params + (limit,)
+        )
+        return [row[:-1] for row in reversed(rows)]
+
+    def snapshot_html(self, digest):
+        rows = self.query("SELECT html FROM snapshots WHERE hash LIKE ?", (f"{digest}%",))
+        return zlib.decompress(rows[0][0]).decode("utf-8") if rows else None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store = None
+
+
+def get_result_store():
+    """Process-wide store, or None when RESULTS=0."""
+    global _store
+    if not RESULTS_ENABLED:
+        return None
+    if _store is None:
+        _store = ResultStore()
+    return _store
+
+
+def record_run(scenario, result, phase_htmls=None):
+    """Store a finished run if the result store is enabled; never fails the run itself."""
+    store = get_result_store()
+    if store is None:
+        return None
+    try:
+        return store.record_run(scenario, result, phase_htmls)
+    except Exception as e:
+        logger.error(f"⚠️ Could not store results for {scenario}: {e}")
+        return None
+
+
+def persist_html(html):
+    """store_html() on the process-wide store; a page that can't be written just has no hash."""
+    try:
+        return get_result_store().store_html(html)
+    except Exception as e:
+        logger.error(f"⚠️ Could not store phase HTML: {e}")
+        return None
@@ -0,0 +1,147 @@
+# core/rule_planner.py
+
+import re
+from core.field_matcher import tokens
+from utils.config import RULE_PLANNER_MIN_CONFIDENCE
+from utils.logger import get_logger
+from utils.tracing import span
+
+logger = get_logger()
+
+# Attributes a selector is built from, most stable first (same order as login_button_selector)
+SELECTOR_ATTRS = ('automation_id', 'id', 'name', 'placeholder')
+TEXT_TYPES = ('', 'text', 'password', 'email', 'search', 'tel', 'url', 'number')
+
+# How sure a match is, by how the field key met the identifier
+EXACT, WORD, SUBSTRING = 1.0, 0.8, 0.4
+
+_CSS_IDENT = re.compile(r'-?[A-Za-z_][\w-]*')
+
+
+def _attr_selector(attr, value):
+    if attr == 'id' and _CSS_IDENT.fullmatch(value):
+        return f"#{value}"
+    quote = '"' if "'" in value else "'"
+    return f"[{attr}={quote}{value}{quote}]"
+
+
+def unique_selector(entry, controls):
+    """CSS selector on the most stable attribute whose value no other visible control shares."""
+    for attr in SELECTOR_ATTRS:
+        value = entry['attrs'].get(attr)
+        if not value or not isinstance(value, str):
+            continue
+        if sum(1 for c in controls if c['attrs'].get(attr) == value) == 1:
+            return _attr_selector(attr, value)
+    return None
+
+
+def _action_for(entry):
+    if entry['tag'] == 'textarea' or (entry['tag'] == 'input' and entry['type'] in TEXT_TYPES):
+        return 'fill'
+    if entry['tag'] == 'input' and entry['type'] == 'file':
+        return 'upload'
+    return None  # selects, checkboxes, radios, date pickers... are left to the model
+
+
+def match_confidence(index, key, position):
+    entry = index.entries[position]
+    if key in entry['normalized'].values():
+        return EXACT
+    if any(i == position for i, _ in index.by_token.get(key, ())):
+        return WORD
+    return SUBSTRING
+
+
+def affinity(entry, anchors):
+    """Longest run of leading identifier words shared with an anchor: txt_clientLoginUserName ~ txt_clientLoginPassword."""
+    words = tokens(entry['identifier'])
+    best = 0
+    for anchor in anchors:
+        shared = 0
+        for a, b in zip(words, tokens(anchor['identifier'])):
+            if a != b:
+                break
+            shared += 1
+        best = max(best, shared)
+    return best
+
+
+class RulePlanner:
+    """
+    Plans fills without the model for fields whose input it can identify: each field
+    is matched through the FieldMatcher (automation_id, id, name, label, placeholder)
+    and scored by how it matched. When another free input matches about as well
+    (two login forms on one page), the one sharing an identifier prefix with the
+    unambiguous picks (else the other picks) wins; if that doesn't settle it, the
+    confidence is halved.
+    Fields below `min_confidence`, without a unique selector, or whose rule-built
+    action already failed are left to the LLM.
+    """
+
+    def __init__(self, matcher, min_confidence=RULE_PLANNER_MIN_CONFIDENCE):
+        self.matcher = matcher
+        self.min_confidence = min_confidence
+        self.rejected = set()
+
+    def _picks(self, snapshot, fields):
+        """{field: [confidence, position, rival positions]} for the matched fields."""
+        index = self.matcher.index(snapshot)
+        matched = self.matcher.match(snapshot, [f for f in fields if f not in self.rejected])
+        position_of = {id(entry): i for i, entry in enumerate(index.entries)}
+        taken = {position_of[id(entry)] for entry in matched.values()}
+        picks = {}
+        for field, entry in matched.items():
+            key = self.matcher.keys[field]
+            position = position_of[id(entry)]
+            candidates = index.candidates(key)
+            top = next(score for score, i in candidates if i == position)
+            rivals = [i for score, i in candidates if i != position and i not in taken and score >= top - 1]
+            picks[field] = [match_confidence(index, key, position), position, rivals]
+        return index, picks
+
+    def _break_ties(self, index, picks):
+        anchors = [index.entries[position] for _, position, rivals in picks.values() if not rivals]
+        taken = {position for _, position, _ in picks.values()}
+        for pick in picks.values():
+            confidence, position, rivals = pick
+            if not rivals:
+                continue
+            # With no unambiguous pick, the fields should at least land in the same form as each other
+            others = anchors or [index.entries[p[1]] for p in picks.values() if p is not pick]
+            ranked = sorted(((affinity(index.entries[i], others), i) for i in [position] + rivals
+                             if i == position or i not in taken), reverse=True)
+            if len(ranked) > 1 and ranked[0][0] > ranked[1][0]:
+                taken.discard(position)
+                pick[1] = ranked[0][1]
+                taken.add(pick[1])
+            else:
+                pick[0] = confidence / 2
+
+    def plan(self, snapshot, fields):
+        """Returns (actions for the confident fields, {field: value} still needing the model)."""
+        with span("plan.rules", fields=len(fields)) as s:
+            index, picks = self._picks(snapshot, fields)
+            self._break_ties(index, picks)
+            actions, unsure = [], {}
+            for field, value in fields.items():
+                confidence, position, _ = picks.get(field, (0.0, None, None))
+                entry = index.entries[position] if position is not None else None
+                action_type = _action_for(entry) if entry else None
+                selector = unique_selector(entry, snapshot.controls) if entry else None
+                if confidence >= self.min_confidence and action_type and selector:
+                    actions.append({'action': action_type, 'selector': selector, 'value': value, 'field': field,
+                                    'planner': 'rules', 'confidence': round(confidence, 2)})
+                else:
+                    unsure[field] = value
+            s.update(planned=len(actions), unsure=len(unsure))
+        if actions:
+            logger.info(f"📐 Rule planner: {len(actions)} fields planned locally, {len(unsure)} left to GPT")
+        return actions, unsure
+
+    def report(self, results):
+        """Fields whose rule-built action failed go to the model from now on."""
+        for result in results:
+            action = result['action']
+            if action.get('planner') == 'rules' and result['status'] != 'ok':
+                self.rejected.add(action['field'])
@@ -0,0 +1,110 @@
+# core/session_cache.py
+
+import hashlib
+import json
+import os
+import time
+from core.feature_parser import discover_scenarios, extract_field_value_map, find_scenario, parse_feature
+from core.field_matcher import FieldMatcher
+from utils.config import SESSION_CACHE_ENABLED, SESSION_DIR, SESSION_TTL_S
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# @session:<name> marks the scenario that logs in; @requires:<name> scenarios start from its session
+PROVIDES_TAG = "@session:"
+REQUIRES_TAG = "@requires:"
+
+
+def credentials_hash(field_values):
+    return hashlib.sha256(json.dumps(sorted(field_values.items())).encode("utf-8")).hexdigest()
+
+
+def session_key(app_url, field_values):
+    """One session per app URL and set of credentials; the credentials themselves are never written."""
+    return hashlib.sha256(f"{app_url}\n{credentials_hash(field_values)}".encode("utf-8")).hexdigest()
+
+
+def _session_path(key):
+    return os.path.join(SESSION_DIR, f"{key[:32]}.json")
+
+
+def load_session(key, ttl=SESSION_TTL_S):
+    """The cached Playwright storage state for `key`, or None when missing or older than ttl seconds."""
+    path = _session_path(key)
+    try:
+        with open(path, "r") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if saved.get('key') != key or time.time() - saved.get('created', 0) > ttl:
+        drop_session(key)
+        return None
+    return saved['state']
+
+
+def save_session(key, state):
+    os.makedirs(SESSION_DIR, exist_ok=True)
+    path = _session_path(key)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    # Cookies are credentials: keep the file private to the user running the suite
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump({'key': key, 'created': time.time(), 'state': state}, f)
+    os.replace(tmp, path)  # concurrent workers never see a half-written file
+
+
+def drop_session(key):
+    try:
+        os.remove(_session_path(key))
+    except OSError:
+        pass
+
+
+def _tag_value(tags, prefix):
+    return next((tag[len(prefix):] for tag in tags if tag.startswith(prefix)), None)
+
+
+def find_session_provider(name, feature_path, features_dir="features"):
+    """(feature_path, scenario) tagged @session:<name>, looked up in the same feature first."""
+    tag = PROVIDES_TAG + name
+    for scenario in parse_feature(feature_path)['scenarios']:
+        if tag in scenario['tags']:
+            return feature_path, scenario['name']
+    for path, scenario_name in discover_scenarios(features_dir):
+        if tag in find_scenario(path, scenario_name)['tags']:
+            return path, scenario_name
+    return None
+
+
+def scenario_session(feature_path, scenario_name, app_url, features_dir="features"):
+    """
+    Session handling for a scenario, or None if it has no session tags (or SESSION_CACHE=0):
+    {'name', 'key', 'provides', 'login'}. A provider saves its storage state once it passes;
+    a dependent starts from that state, or runs the provider's `login` (field values, goal) first.
+    """
+    if not SESSION_CACHE_ENABLED:
+        return None
+    scenario = find_scenario(feature_path, scenario_name)
+    if scenario is None:
+        return None
+
+    name = _tag_value(scenario['tags'], PROVIDES_TAG)
+    if name:
+        login = extract_field_value_map(feature_path, scenario_name)
+        return {'name': name, 'key': session_key(app_url, login[0]), 'provides': True, 'login': login}
+
+    name = _tag_value(scenario['tags'], REQUIRES_TAG)
+    if not name:
+        return None
+    provider = find_session_provider(name, feature_path, features_dir)
+    if provider is None:
+        logger.warning(f"⚠️ No scenario is tagged {PROVIDES_TAG}{name}; {scenario_name} will run without it")
+        return None
+    login = extract_field_value_map(*provider)
+    return {'name': name, 'key': session_key(app_url, login[0]), 'provides': False, 'login': login}
+
+
+def session_expired(snapshot, login_values):
+    """A restored session the server no longer accepts lands back on the login form."""
+    return bool(FieldMatcher(login_values).match(snapshot))
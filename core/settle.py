@@ -0,0 +1,121 @@
+# core/settle.py
+
+import re
+import time
+from core.drive import drive, drive_async
+from core.feature_parser import find_scenario
+from utils.config import SETTLE_NETWORK_IDLE_MS, SETTLE_QUIET_MS, SETTLE_TIMEOUT_MS
+from utils.tracing import span
+
+# Resolves once no DOM mutation has happened for `quiet` ms, or after `timeout` ms.
+DOM_QUIET_SCRIPT = """
+([quiet, timeout]) => new Promise((resolve) => {
+    let timer = null;
+    const done = (reason) => {
+        observer.disconnect();
+        clearTimeout(timer);
+        clearTimeout(cap);
+        resolve(reason);
+    };
+    const observer = new MutationObserver(() => {
+        clearTimeout(timer);
+        timer = setTimeout(() => done('quiet'), quiet);
+    });
+    observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    timer = setTimeout(() => done('quiet'), quiet);
+    const cap = setTimeout(() => done('timeout'), timeout);
+})
+"""
+
+
+# Per-scenario overrides in milliseconds, tagged on the scenario or its feature:
+# @settle-timeout:8000 @settle-quiet:500 @settle-network-idle:0
+SETTLE_TAGS = {'@settle-timeout:': 'timeout', '@settle-quiet:': 'quiet', '@settle-network-idle:': 'network_idle'}
+
+
+def settle_options(options=None):
+    """Defaults from config, overridden per scenario by `options`."""
+    opts = {'timeout': SETTLE_TIMEOUT_MS, 'quiet': SETTLE_QUIET_MS, 'network_idle': SETTLE_NETWORK_IDLE_MS}
+    opts.update(options or {})
+    return opts
+
+
+def tagged_settle_options(feature_path, scenario_name):
+    """The @settle-* overrides of a scenario, or None if it has none."""
+    scenario = find_scenario(feature_path, scenario_name)
+    options = {}
+    for tag in scenario['tags'] if scenario else ():
+        for prefix, name in SETTLE_TAGS.items():
+            if tag.startswith(prefix) and tag[len(prefix):].isdigit():
+                options[name] = int(tag[len(prefix):])
+    return options or None
+
+
+def expected_field_selector(field_keys):
+    """CSS selector matching any input whose identifier contains one of the field keys."""
+    parts = []
+    for key in field_keys:
+        key = re.sub(r'[^A-Za-z0-9_-]', '', key)
+        if not key:
+            continue
+        for attr in ('automation_id', 'name', 'id', 'placeholder'):
+            parts.append(f"input[{attr}*='{key}' i]")
+    return ", ".join(parts) or None
+
+
+class _Deadline:
+    def __init__(self, timeout_ms):
+        self.end = time.monotonic() + timeout_ms / 1000
+
+    def remaining(self, cap=None):
+        left = max(0, int((self.end - time.monotonic()) * 1000))
+        return min(left, cap) if cap is not None else left
+
+
+def settle(page, expect=None, options=None):
+    return drive(settle_steps(page, expect, options))
+
+
+async def settle_async(page, expect=None, options=None):
+    """settle() for playwright.async_api pages."""
+    return await drive_async(settle_steps(page, expect, options))
+
+
+def settle_steps(page, expect=None, options=None):
+    """
+    Wait until the page is ready instead of sleeping a fixed time: DOM mutations go
+    quiet, navigation reaches domcontentloaded, then either the expected selector is
+    visible or the network goes idle (capped at options['network_idle'] ms).
+    Never waits longer than options['timeout'] ms. Steps for core.drive.
+    """
+    with span("settle", expect=bool(expect)) as s:
+        s['outcome'] = yield from _settle_steps(page, expect, options)
+        return s['outcome']
+
+
+def _settle_steps(page, expect=None, options=None):
+    opts = settle_options(options)
+    deadline = _Deadline(opts['timeout'])
+
+    try:
+        yield page.evaluate(DOM_QUIET_SCRIPT, [opts['quiet'], deadline.remaining()])
+    except Exception:
+        pass  # A navigation destroyed the context; the load state wait covers it
+    if deadline.remaining():
+        try:
+            yield page.wait_for_load_state("domcontentloaded", timeout=deadline.remaining())
+        except Exception:
+            pass
+    if expect and deadline.remaining():
+        try:
+            yield page.wait_for_selector(expect, state="visible", timeout=deadline.remaining())
+            return "expected"
+        except Exception:
+            pass
+    if opts['network_idle'] and deadline.remaining():
+        try:
+            yield page.wait_for_load_state("networkidle", timeout=deadline.remaining(opts['network_idle']))
+            return "networkidle"
+        except Exception:
+            return "timeout"
+    return "quiet"
@@ -0,0 +1,261 @@
+# core/snapshot.py
+
+import importlib.util
+from core.drive import Blocking, drive, drive_async
+from utils.config import EXTRACTION_BACKEND
+from utils.tracing import span
+
+# bs4 itself is imported on the first parse, so importing this module stays cheap
+HTML_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+
+SUMMARY_TAGS = ['input', 'button', 'a', 'select', 'textarea', 'form']
+SUMMARY_LIMIT = 100
+
+
+def _hides_itself(tag):
+    if tag.has_attr('hidden'):
+        return True
+    if (tag.get('aria-hidden', '') or '').strip().lower() == 'true':
+        return True
+    style = (tag.get('style', '') or '').replace(" ", "").lower()
+    return 'display:none' in style or 'visibility:hidden' in style
+
+
+def compute_hidden(root):
+    """
+    Single top-down pass carrying an inherited "hidden" flag.
+    Returns {id(tag): bool} so each visibility check is a dict lookup.
+    """
+    from bs4 import Tag
+    hidden = {}
+    stack = [(root, False)]
+    while stack:
+        node, parent_hidden = stack.pop()
+        node_hidden = parent_hidden or _hides_itself(node)
+        hidden[id(node)] = node_hidden
+        for child in node.contents:
+            if isinstance(child, Tag):
+                stack.append((child, node_hidden))
+    return hidden
+
+
+def _text(tag, limit=80):
+    return " ".join(tag.get_text(" ", strip=True).split())[:limit]
+
+
+def _field_identifier(tag):
+    return (
+            tag.get('automation_id') or
+            tag.get('name') or
+            tag.get('id') or
+            tag.get('placeholder')
+    )
+
+
+class PageSnapshot:
+    """
+    Parses a page once and precomputes everything the extractors need:
+    visible input identifiers, their values, login buttons and the UI summary.
+    """
+
+    def __init__(self, html):
+        from bs4 import BeautifulSoup
+        self.html = html
+        self.soup = BeautifulSoup(html, HTML_PARSER)
+        self._hidden = compute_hidden(self.soup)
+        self.visible_inputs = set()
+        self.input_values = {}
+        self.login_buttons = []
+        self.summary_elements = []
+        self.controls = []
+        self.summary_lines = []
+        labels_by_for = {}
+        index = -1
+
+        for e in self.soup.find_all(SUMMARY_TAGS + ['label']):
+            if e.name == 'label':
+                if e.get('for'):
+                    labels_by_for[e['for']] = _text(e)
+                continue
+            index += 1
+            e_type = (e.get('type', '') or '').lower()
+            if self.is_hidden(e):
+                continue
+
+            if index < SUMMARY_LIMIT and e_type != 'hidden':
+                self.summary_elements.append((e.name, e.attrs))
+                self.summary_lines.append(f"{str(e)}\nAttributes: {e.attrs}")
+
+            if e.name != 'form' and e_type != 'hidden':
+                wrapping = e.find_parent('label') if e.name in ('input', 'select', 'textarea') else None
+                self.controls.append({
+                    'tag': e.name,
+                    'type': e_type,
+                    'attrs': e.attrs,
+                    'text': _text(e) if e.name in ('button', 'a') else '',
+                    'label': _text(wrapping) if wrapping else '',
+                })
+
+            if e.name == 'input':
+                self._add_input(e, e_type)
+            if e.name in ('input', 'button'):
+                self._add_login_button(e, e_type)
+
+        for control in self.controls:
+            if not control['label'] and control['attrs'].get('id') in labels_by_for:
+                control['label'] = labels_by_for[control['attrs']['id']]
+
+        self.ui_summary = "\n".join(self.summary_lines)
+
+    def is_hidden(self, tag):
+        return self._hidden.get(id(tag), False)
+
+    def _add_input(self, input_tag, input_type):
+        if input_type == 'hidden':
+            return
+        identifier = _field_identifier(input_tag)
+        if not identifier:
+            return
+        self.visible_inputs.add(identifier.strip())
+        if input_type != "password":
+            self.input_values[identifier.strip()] = input_tag.get('value', '')
+
+    def _add_login_button(self, btn, btn_type):
+        if btn.name == 'input' and btn_type == 'submit':
+            label = btn.get('value', '').lower()
+        elif btn.name == 'button':
+            label = (btn.get_text() or '').lower()
+        else:
+            return
+        if 'login' in label:
+            self.login_buttons.append(btn)
+
+
+# The one in-page visibility rule, shared by the probe below, the executor
+# (core.executor) and the batched planner's stage matching (core.planner): hidden
+# ancestors, computed styles (including opacity and collapse) and an empty box.
+IS_VISIBLE_JS = """\
+    const isVisible = (el) => {
+        if (el.closest('[hidden], [aria-hidden="true"]')) return false;
+        if (typeof el.checkVisibility === 'function' &&
+            !el.checkVisibility({checkOpacity: true, checkVisibilityCSS: true})) return false;
+        const style = window.getComputedStyle(el);
+        if (style.display === 'none' || style.visibility === 'hidden' ||
+            style.visibility === 'collapse') return false;
+        const rect = el.getBoundingClientRect();
+        return rect.width > 0 && rect.height > 0;
+    };
+"""
+
+# Runs inside the page: uses computed styles and bounding boxes so CSS-class
+# hiding is caught, and only returns the visible interactive elements.
+BROWSER_PROBE_SCRIPT = """
+([tags, limit]) => {
+""" + IS_VISIBLE_JS + """
+    const openingTag = (el) => {
+        const html = el.outerHTML;
+        return html.slice(0, html.indexOf('>') + 1);
+    };
+    const out = [];
+    document.querySelectorAll(tags.join(',')).forEach((el, index) => {
+        const type = (el.getAttribute('type') || '').toLowerCase();
+        if (type === 'hidden' || !isVisible(el)) return;
+        const attrs = {};
+        for (const a of el.attributes) attrs[a.name] = a.value;
+        const tag = el.tagName.toLowerCase();
+        out.push({
+            index: index,
+            tag: tag,
+            type: type,
+            attrs: attrs,
+            value: 'value' in el ? String(el.value ?? '') : '',
+            text: (el.innerText || '').trim().slice(0, 200),
+            label: el.labels && el.labels.length ? (el.labels[0].innerText || '').trim().slice(0, 80) : '',
+            html: index < limit ? (tag === 'form' ? openingTag(el) : el.outerHTML) : '',
+        });
+    });
+    return out;
+}
+"""
+
+
+class BrowserSnapshot:
+    """
+    Same interface as PageSnapshot, but visibility is evaluated by the browser
+    in one page.evaluate call instead of serializing and parsing the full DOM.
+    Login buttons are returned as attribute dicts (they support .get like a Tag).
+    """
+
+    def __init__(self, elements):
+        self.elements = elements
+        self.visible_inputs = set()
+        self.input_values = {}
+        self.login_buttons = []
+        self.summary_elements = []
+        self.controls = []
+        self.summary_lines = []
+
+        for e in self.elements:
+            attrs = e['attrs']
+            if e['html']:
+                self.summary_elements.append((e['tag'], attrs))
+                self.summary_lines.append(f"{e['html']}\nAttributes: {attrs}")
+            if e['tag'] != 'form':
+                self.controls.append({
+                    'tag': e['tag'],
+                    'type': e['type'],
+                    'attrs': attrs,
+                    'text': " ".join(e['text'].split())[:80] if e['tag'] in ('button', 'a') else '',
+                    'label': e['label'],
+                })
+
+            if e['tag'] == 'input':
+                identifier = _field_identifier(attrs)
+                if identifier:
+                    self.visible_inputs.add(identifier.strip())
+                    if e['type'] != "password":
+                        # Live DOM value, so fields filled by Playwright are seen too
+                        self.input_values[identifier.strip()] = e['value']
+
+            if e['tag'] == 'input' and e['type'] == 'submit':
+                label = (attrs.get('value', '') or '').lower()
+            elif e['tag'] == 'button':
+                label = (e['text'] or '').lower()
+            else:
+                continue
+            if 'login' in label:
+                self.login_buttons.append(attrs)
+
+        self.ui_summary = "\n".join(self.summary_lines)
+
+
+def take_snapshot(page, backend=None):
+    """Build a snapshot of the live page with the configured extraction backend."""
+    return drive(snapshot_steps(page, backend))
+
+
+async def take_snapshot_async(page, backend=None):
+    """take_snapshot for playwright.async_api pages; HTML parsing runs off the event loop."""
+    return await drive_async(snapshot_steps(page, backend))
+
+
+def snapshot_steps(page, backend=None):
+    """take_snapshot() as steps for core.drive."""
+    backend = (backend or EXTRACTION_BACKEND).lower()
+    if backend == "browser":
+        with span("extract.browser_probe"):
+            return BrowserSnapshot((yield page.evaluate(BROWSER_PROBE_SCRIPT, [SUMMARY_TAGS, SUMMARY_LIMIT])))
+    if backend == "html":
+        with span("page.content") as s:
+            html = yield page.content()
+            s['bytes'] = len(html)
+        with span("extract.parse"):
+            return (yield Blocking(PageSnapshot, html))
+    raise ValueError(f"Unknown extraction backend: {backend}")
+
+
+def as_snapshot(html_or_snapshot):
+    """Accept raw HTML or an existing snapshot so callers can share one parse."""
+    if isinstance(html_or_snapshot, str):
+        return PageSnapshot(html_or_snapshot)
+    return html_or_snapshot
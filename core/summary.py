@@ -0,0 +1,99 @@
+# core/summary.py
+
+import re
+
+# Rough chars-per-token ratio for GPT tokenizers on HTML-ish text
+CHARS_PER_TOKEN = 4
+
+_CSS_IDENT = re.compile(r'^[A-Za-z_][\w-]*$')
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def normalize(text):
+    return re.sub(r'[^a-z0-9]', '', (text or '').lower())
+
+
+def _quote(value):
+    return value.replace("\\", "\\\\").replace("'", "\\'")
+
+
+def selector_candidates(tag, attrs, text=''):
+    """Best CSS selectors for an element, most stable first."""
+    candidates = []
+    if attrs.get('automation_id'):
+        candidates.append(f"[automation_id='{_quote(attrs['automation_id'])}']")
+    if attrs.get('id'):
+        element_id = attrs['id']
+        candidates.append(f"#{element_id}" if _CSS_IDENT.match(element_id) else f"[id='{_quote(element_id)}']")
+    if attrs.get('name'):
+        candidates.append(f"{tag}[name='{_quote(attrs['name'])}']")
+    if attrs.get('placeholder'):
+        candidates.append(f"{tag}[placeholder='{_quote(attrs['placeholder'])}']")
+    if tag == 'input' and attrs.get('value') and (attrs.get('type') or '').lower() in ('submit', 'button'):
+        candidates.append(f"input[value='{_quote(attrs['value'])}']")
+    return candidates
+
+
+def _relevance(control, field_keys):
+    haystack = normalize(" ".join([
+        str(control['attrs'].get(a, '') or '') for a in ('automation_id', 'name', 'id', 'placeholder')
+    ] + [control['label'], control['text']]))
+    score = 0
+    for key in field_keys:
+        if key and key in haystack:
+            score += 10
+    if control['tag'] in ('input', 'select', 'textarea') and control['type'] not in ('submit', 'button'):
+        score += 3
+    elif control['tag'] == 'button' or control['type'] in ('submit', 'button'):
+        score += 2
+    return score
+
+
+def _describe(control):
+    attrs = control['attrs']
+    parts = [control['tag']]
+    if control['type']:
+        parts.append(f"type={control['type']}")
+    selectors = selector_candidates(control['tag'], attrs)[:2]
+    if selectors:
+        parts.append("sel=" + " | ".join(selectors))
+    if control['label']:
+        parts.append(f'label="{control["label"]}"')
+    if control['text']:
+        parts.append(f'text="{control["text"]}"')
+    if attrs.get('placeholder'):
+        parts.append(f'placeholder="{attrs["placeholder"]}"')
+    if control['tag'] == 'input' and control['type'] in ('submit', 'button') and attrs.get('value'):
+        parts.append(f'value="{attrs["value"]}"')
+    return " ".join(parts)
+
+
+def compact_summary(snapshot, field_names=(), token_budget=1500):
+    """
+    One short line per visible control, ranked so elements matching the
+    requested fields come first, and cut off at the token budget.
+    Forms are not dumped: their controls are listed individually.
+    """
+    field_keys = [normalize(k) for k in field_names]
+    ranked = sorted(
+        enumerate(snapshot.controls),
+        key=lambda item: (-_relevance(item[1], field_keys), item[0])
+    )
+
+    lines = []
+    seen = set()
+    used = 0
+    for _, control in ranked:
+        line = _describe(control)
+        if line in seen or line == control['tag']:
+            continue
+        cost = estimate_tokens(line) + 1
+        if used + cost > token_budget:
+            break
+        seen.add(line)
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
@@ -1,3 +1,4 @@
+@session:login
 Scenario: Valid login
 Given user Enter Corp Code as SLQA
 When user Enter Location Code as TEST7
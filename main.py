@@ -1,11 +1,91 @@
+import argparse
+import json
 import os
-from runners.run_tests import run_agent
-from utils.memory import load_memory, save_memory
-from core.feature_parser import extract_field_value_map
+import re
+import sys
+from utils.memory import load_memory, resolve, save_memory
+from core.feature_parser import discover_scenarios, extract_field_value_map, find_scenario, parse_feature
 
-if __name__ == "__main__":
-    memory = load_memory()
+# Only `run` and the interactive prompt need the browser and the model; the other
+# commands import nothing heavier than the feature parser so they start instantly.
+
+
+def run_agent(field_values, additional_goal, feature_path, scenario):
+    from core.session_cache import scenario_session
+    from core.settle import tagged_settle_options
+    from runners.run_tests import app_url, run_agent as _run_agent
+    return _run_agent(field_values, additional_goal, trace_name=f"{feature_path}::{scenario}",
+                      session=scenario_session(feature_path, scenario, app_url()),
+                      settle_options=tagged_settle_options(feature_path, scenario))
+
+
+def list_shortcuts(memory):
+    if not memory:
+        print("No shortcuts saved.")
+    for name, saved in sorted(memory.items()):
+        print(f"{name}: {saved.get('feature_path')}::{saved.get('scenario')}")
+    return 0
+
+
+def parse_target(target, memory):
+    feature_path, scenario = resolve(target, memory)
+    if not feature_path:
+        print("Invalid shortcut or feature path.")
+        return 1
+    field_values, additional_goal = extract_field_value_map(feature_path, scenario)
+    print(json.dumps({'feature_path': feature_path, 'scenario': scenario,
+                      'field_values': field_values, 'additional_goal': additional_goal}, indent=2))
+    return 0
+
+
+def validate(features_dir, memory):
+    """Parse every feature file and check each scenario and shortcut; returns the number of problems."""
+    problems = []
+    for root, _, files in os.walk(features_dir):
+        for name in sorted(files):
+            if not name.endswith(".feature"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                feature = parse_feature(path)
+            except Exception as e:
+                problems.append(f"{path}: cannot parse ({e})")
+                continue
+            seen = set()
+            for scenario in feature['scenarios']:
+                label = f"{path}::{scenario['name']}"
+                if scenario['name'] in seen:
+                    problems.append(f"{label}: duplicate scenario name")
+                seen.add(scenario['name'])
+                if not scenario['steps']:
+                    problems.append(f"{label}: no steps")
+                unresolved = {p for step in scenario['steps'] for p in re.findall(r'<([^<>]+)>', step)}
+                if scenario['outline'] and unresolved:
+                    problems.append(f"{label}: unresolved placeholders {sorted(unresolved)}")
+    for shortcut, saved in sorted(memory.items()):
+        feature_path, scenario = saved.get("feature_path"), saved.get("scenario")
+        if not feature_path or not scenario:
+            problems.append(f"shortcut {shortcut}: missing feature_path or scenario")
+        elif not os.path.exists(feature_path) or find_scenario(feature_path, scenario) is None:
+            problems.append(f"shortcut {shortcut}: {feature_path}::{scenario} not found")
 
+    for problem in problems:
+        print(problem)
+    print(f"{len(discover_scenarios(features_dir))} scenarios, {len(problems)} problems")
+    return 1 if problems else 0
+
+
+def run_target(target, memory):
+    feature_path, scenario = resolve(target, memory)
+    if not feature_path:
+        print("Invalid shortcut or feature path.")
+        return 1
+    field_values, additional_goal = extract_field_value_map(feature_path, scenario)
+    result = run_agent(field_values, additional_goal, feature_path, scenario)
+    return 0 if result.get('passed') else 1
+
+
+def interactive(memory):
     shortcut = input("Enter shortcut or feature path (e.g., features/login.feature::Valid login): ").strip()
 
     if ".feature" in shortcut and "::" in shortcut:
@@ -26,7 +106,7 @@ if __name__ == "__main__":
             }
             save_memory(memory)
 
-        run_agent(field_values, additional_goal)
+        run_agent(field_values, additional_goal, feature_path, scenario)
 
     elif shortcut in memory:
         saved = memory[shortcut]
@@ -36,7 +116,36 @@ if __name__ == "__main__":
             print("Shortcut is missing required fields.")
         else:
             field_values, additional_goal = extract_field_value_map(feature_path, scenario)
-            run_agent(field_values, additional_goal)
+            run_agent(field_values, additional_goal, feature_path, scenario)
 
     else:
         print("Invalid shortcut or feature path.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI-driven feature runner. Without a command, prompts for a shortcut.")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("list", help="list saved shortcuts")
+    parse = commands.add_parser("parse", help="print the field values and goal extracted from a scenario")
+    parse.add_argument("target", help="shortcut name or path.feature::Scenario")
+    check = commands.add_parser("validate", help="check feature files and shortcuts without running anything")
+    check.add_argument("features_dir", nargs="?", default="features")
+    run = commands.add_parser("run", help="run a scenario without prompting")
+    run.add_argument("target", help="shortcut name or path.feature::Scenario")
+    args = parser.parse_args()
+
+    memory = load_memory()
+    if args.command == "list":
+        return list_shortcuts(memory)
+    if args.command == "parse":
+        return parse_target(args.target, memory)
+    if args.command == "validate":
+        return validate(args.features_dir, memory)
+    if args.command == "run":
+        return run_target(args.target, memory)
+    interactive(memory)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
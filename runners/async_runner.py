@@ -0,0 +1,183 @@
+import argparse
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from core.browser import PROFILES, get_profile, launch_options, new_context_async
+from core.drive import drive_async
+from core.feature_parser import discover_scenarios, extract_field_value_map
+from core.llm import get_gateway, set_token_budget
+from core.result_store import get_result_store, persist_html, record_run
+from core.session_cache import drop_session, load_session, save_session, scenario_session, session_expired
+from core.settle import settle_async, tagged_settle_options
+from core.snapshot import take_snapshot_async
+from runners.run_tests import app_url, expect_next_fields, phase_loop, precondition_failed
+from utils.config import RESULTS_ENABLED
+from utils.logger import get_logger
+from utils.tracing import finish_trace, span, start_trace
+
+logger = get_logger()
+
+
+class BrowserPool:
+    """
+    A fixed set of launched browsers. Each scenario gets its own isolated context
+    on the least busy browser, so browsers are reused but cookies/storage are not
+    (unless a cached session's storage_state is passed in). Launch arguments, context
+    options and request blocking come from the browser profile (see core.browser).
+    """
+
+    def __init__(self, playwright, size=2, headless=True, profile=None):
+        self.playwright = playwright
+        self.size = size
+        self.profile = get_profile(profile)
+        self.launch = launch_options(self.profile, headless)
+        self._browsers = []
+        self._load = []
+
+    async def start(self):
+        for _ in range(self.size):
+            with span("browser.launch", profile=self.profile['name']):
+                self._browsers.append(await self.playwright.chromium.launch(**self.launch))
+            self._load.append(0)
+
+    @asynccontextmanager
+    async def context(self, **options):
+        """Yields (context, blocked request counts)."""
+        index = self._load.index(min(self._load))
+        self._load[index] += 1
+        try:
+            async with new_context_async(self._browsers[index], self.profile, **options) as opened:
+                yield opened
+        finally:
+            self._load[index] -= 1
+
+    async def close(self):
+        for browser in self._browsers:
+            await browser.close()
+        self._browsers, self._load = [], []
+
+
+async def run_phases_async(page, field_values, additional_goal, extraction_backend=None, max_phases=8,
+                           settle_options=None, planning=None, html_sink=None):
+    """Async counterpart of run_tests.run_phases."""
+    return await drive_async(phase_loop(page, field_values, additional_goal, extraction_backend, max_phases,
+                                        settle_options, planning, html_sink))
+
+
+async def enter_session_async(page, session, restored, extraction_backend=None, settle_options=None):
+    """Async counterpart of run_tests.enter_session."""
+    login_values, login_goal = session['login']
+    if restored:
+        if not session_expired(await take_snapshot_async(page, extraction_backend), login_values):
+            logger.info(f"🔑 Reusing the cached '{session['name']}' session.")
+            return True
+        logger.info(f"🔑 Cached '{session['name']}' session was rejected, logging in again.")
+        drop_session(session['key'])
+    with span("session.login", session=session['name']):
+        login, _ = await run_phases_async(page, login_values, login_goal, extraction_backend,
+                                          settle_options=settle_options)
+    if not login['passed']:
+        logger.error(f"❌ Precondition '{session['name']}' failed: unfilled {login['unfilled']}")
+        return False
+    save_session(session['key'], await page.context.storage_state())
+    return True
+
+
+async def run_scenario_async(pool, feature_path, scenario, extraction_backend=None, settle_options=None,
+                             planning=None, keep_html=True):
+    field_values, additional_goal = extract_field_value_map(feature_path, scenario)
+    session = scenario_session(feature_path, scenario, app_url())
+    # Runner-wide options, with the scenario's own @settle-* tags on top
+    settle_options = {**(settle_options or {}), **(tagged_settle_options(feature_path, scenario) or {})} or None
+    requires = session is not None and not session['provides']
+    state = load_session(session['key']) if requires else None
+    html_sink = persist_html if not keep_html and get_result_store() else None
+    async with pool.context(**({'storage_state': state} if state else {})) as (context, blocked):
+        page = await context.new_page()
+        with span("page.goto"):
+            await page.goto(app_url())
+        first_fields = session['login'][0] if requires and state is None else field_values
+        await settle_async(page, expect_next_fields(first_fields, set()), settle_options)
+
+        logged_in = not requires or await enter_session_async(page, session, state is not None, extraction_backend,
+                                                              settle_options)
+        if not logged_in:
+            result, phase_htmls = precondition_failed(field_values, session), {}
+        else:
+            if requires:
+                await settle_async(page, expect_next_fields(field_values, set()), settle_options)
+            result, phase_htmls = await run_phases_async(page, field_values, additional_goal, extraction_backend,
+                                                         settle_options=settle_options, planning=planning,
+                                                         html_sink=html_sink)
+            if session is not None and session['provides'] and result['passed']:
+                save_session(session['key'], await context.storage_state())
+    result['blocked_requests'] = blocked['blocked']
+    result['run_id'] = record_run(f"{feature_path}::{scenario}", result, phase_htmls)
+    return result
+
+
+async def run_scenarios_async(scenarios, concurrency=4, browsers=2, headless=True, extraction_backend=None,
+                              browser_profile=None, settle_options=None, planning=None, keep_html=True):
+    """
+    Run [(feature_path, scenario_name), ...] concurrently on a shared browser pool.
+    Returns one result dict per scenario, in input order. settle_options, planning and
+    keep_html are passed to every scenario (see run_tests.run_agent).
+    """
+    from playwright.async_api import async_playwright
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(pool, feature_path, scenario):
+        async with semaphore:
+            start = time.perf_counter()
+            tracer = start_trace(f"{feature_path}::{scenario}", collect=RESULTS_ENABLED)
+            try:
+                result = await run_scenario_async(pool, feature_path, scenario, extraction_backend, settle_options,
+                                                  planning, keep_html)
+            except Exception as e:
+                logger.error(f"❌ {feature_path}::{scenario} crashed: {e}")
+                result = {'passed': False, 'error': str(e), 'duration': round(time.perf_counter() - start, 3)}
+                result['run_id'] = record_run(f"{feature_path}::{scenario}", result)
+            result['trace'] = finish_trace(tracer, logger)
+            return {'feature': feature_path, 'scenario': scenario, **result}
+
+    async with async_playwright() as p:
+        pool = BrowserPool(p, size=max(1, min(browsers, concurrency)), headless=headless, profile=browser_profile)
+        await pool.start()
+        try:
+            return await asyncio.gather(*(run_one(pool, f, s) for f, s in scenarios))
+        finally:
+            await pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run feature scenarios concurrently.")
+    parser.add_argument("features_dir", nargs="?", default="features")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--browsers", type=int, default=2)
+    parser.add_argument("--headed", action="store_true")
+    parser.add_argument("--profile", choices=sorted(PROFILES), help="browser profile, defaults to BROWSER_PROFILE")
+    parser.add_argument("--tokens-per-minute", type=int, default=0,
+                        help="LLM token budget shared by the concurrent scenarios (default: no limit)")
+    args = parser.parse_args()
+
+    if args.tokens_per_minute:
+        set_token_budget(args.tokens_per_minute)
+    scenarios = discover_scenarios(args.features_dir)
+    start = time.perf_counter()
+    results = asyncio.run(run_scenarios_async(
+        scenarios, concurrency=args.concurrency, browsers=args.browsers, headless=not args.headed,
+        browser_profile=args.profile
+    ))
+    for r in results:
+        status = "PASS" if r['passed'] else "FAIL"
+        print(f"{status}  {r['duration']:>7.2f}s  {r['feature']}::{r['scenario']}")
+    passed = sum(1 for r in results if r['passed'])
+    print(f"{passed}/{len(results)} passed in {time.perf_counter() - start:.2f}s")
+    stats = get_gateway().stats
+    print(f"LLM requests: {stats['requests']}, retries: {stats['retries']}, deduped: {stats['deduped']}, "
+          f"throttled: {stats['throttled_ms'] / 1000:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import os
+import sys
+import time
+from core.result_store import ResultStore
+from utils.config import RESULTS_DIR
+
+
+def print_runs(store, args):
+    where, params = ("WHERE scenario LIKE ?", (f"%{args.scenario}%",)) if args.scenario else ("", ())
+    rows = store.query(
+        "SELECT id, started, build, passed, duration, phases, llm_calls, failed_actions, scenario "
+        f"FROM runs {where} ORDER BY id DESC LIMIT ?", params + (args.limit,)
+    )
+    print(f"{'id':>5}  {'started':<19}  {'build':<10}{'':6}{'secs':>8}{'phases':>8}{'llm':>5}{'fail':>6}  scenario")
+    for run_id, started, build, passed, duration, phases, llm_calls, failed, scenario in rows:
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(started))
+        status = "PASS" if passed else "FAIL"
+        print(f"{run_id:>5}  {when:<19}  {build or '':<10}{status:<6}{duration or 0:>8.2f}{phases or 0:>8}"
+              f"{llm_calls or 0:>5}{failed or 0:>6}  {scenario}")
+
+
+def print_run(store, args):
+    phases = store.query(
+        "SELECT phase, duration, llm_calls, prompt_tokens, completion_tokens, failed_actions, html_hash "
+        "FROM phases WHERE run_id = ? ORDER BY phase", (args.run_id,)
+    )
+    if not phases:
+        print(f"No run {args.run_id}")
+        return 1
+    actions = store.query("SELECT phase, action, selector, status, cached FROM actions WHERE run_id = ?",
+                          (args.run_id,))
+    for phase, duration, llm_calls, prompt_tokens, completion_tokens, failed, digest in phases:
+        print(f"phase {phase}: {duration:.2f}s, {llm_calls} LLM calls ({prompt_tokens}+{completion_tokens} tokens), "
+              f"{failed} failed, html {digest[:12] if digest else '-'}")
+        for _, action, selector, status, cached in (a for a in actions if a[0] == phase):
+            print(f"    {status:<9}{action:<8}{selector}{'  (cached)' if cached else ''}")
+    return 0
+
+
+def print_slow_phases(store, args):
+    print(f"{'phase':>5}{'runs':>6}{'avg s':>9}{'max s':>9}{'llm':>6}  scenario")
+    for scenario, phase, runs, avg, worst, llm_calls in store.slowest_phases(args.limit, args.scenario):
+        print(f"{phase:>5}{runs:>6}{avg:>9.2f}{worst:>9.2f}{llm_calls:>6.1f}  {scenario}")
+
+
+def print_selectors(store, args):
+    print(f"{'attempts':>8}{'failures':>10}{'runs':>6}  selector")
+    for selector, attempts, failures, runs in store.retried_selectors(args.limit, args.scenario):
+        print(f"{attempts:>8}{failures:>10}{runs:>6}  {selector}")
+
+
+def print_trends(store, args):
+    print(f"{'build':<12}{'runs':>6}{'pass %':>8}{'avg s':>9}{'llm':>6}{'tokens':>9}")
+    for build, runs, pass_rate, avg, llm_calls, tokens in store.build_trends(args.limit, args.scenario):
+        print(f"{build or '':<12}{runs:>6}{pass_rate * 100:>8.0f}{avg or 0:>9.2f}{llm_calls or 0:>6.1f}"
+              f"{tokens or 0:>9.0f}")
+
+
+def print_html(store, args):
+    html = store.snapshot_html(args.hash)
+    if html is None:
+        print(f"No snapshot {args.hash}")
+        return 1
+    sys.stdout.write(html)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the scenario result store.")
+    parser.add_argument("--db", default=os.path.join(RESULTS_DIR, "results.db"))
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--scenario", help="only scenarios whose id contains this")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("runs", help="most recent runs")
+    run = commands.add_parser("run", help="phases and actions of one run")
+    run.add_argument("run_id", type=int)
+    commands.add_parser("slow-phases", help="phases by average duration")
+    commands.add_parser("selectors", help="selectors that were retried or failed")
+    commands.add_parser("trends", help="pass rate, duration and LLM usage per build")
+    html = commands.add_parser("html", help="print a stored phase HTML by (prefix of) its hash")
+    html.add_argument("hash")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"No result store at {args.db}")
+        return 1
+    store = ResultStore(args.db)
+    try:
+        handler = {
+            'runs': print_runs, 'run': print_run, 'slow-phases': print_slow_phases, 'selectors': print_selectors,
+            'trends': print_trends, 'html': print_html,
+        }[args.command]
+        return handler(store, args) or 0
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
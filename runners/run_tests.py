@@ -1,260 +1,379 @@
 import os
-import json
-from core.agent import get_next_actions
-from core.feature_parser import extract_field_value_map
-from utils.environment import load_env
-from utils.memory import load_memory, save_memory
+import time
+from collections import defaultdict
+from core.agent import get_next_actions_steps
 from utils.logger import get_logger
-from playwright.sync_api import sync_playwright
-from bs4 import BeautifulSoup
+from core.snapshot import as_snapshot, snapshot_steps, take_snapshot
+from core.action_cache import record_action_results
+from core.drive import drive
+from core.executor import FILL_ACTIONS, execute_steps
+from core.field_matcher import FieldMatcher
+from core.result_store import get_result_store, persist_html, phase_detail, phase_mark, record_run
+from core.rule_planner import RulePlanner
+from core.session_cache import drop_session, load_session, save_session, session_expired
+from core.settle import expected_field_selector, settle, settle_steps
+from core.planner import BatchedPlanner
+from core.dom_diff import PhaseDiffer
+from utils.config import LLM_STREAMING, PLANNING_MODE, RESULTS_ENABLED, RULE_PLANNER_ENABLED
+from utils.tracing import finish_trace, span, start_trace
 
 logger = get_logger()
-memory = load_memory()
-env = load_env()
 
 def extract_visible_input_fields(html):
-    from bs4 import BeautifulSoup
-    soup = BeautifulSoup(html, 'html.parser')
-    visible_fields = set()
-    for input_tag in soup.find_all('input'):
-        style = (input_tag.get('style', '') or '').replace(" ", "").lower()
-        input_type = (input_tag.get('type', '') or '').lower()
-        if 'display:none' in style or 'visibility:hidden' in style or input_type == 'hidden':
-            continue
-        # Skip if parent is hidden
-        parent = input_tag.parent
-        parent_hidden = False
-        while parent:
-            parent_style = (parent.get('style', '') or '').replace(" ", "").lower()
-            if 'display:none' in parent_style or 'visibility:hidden' in parent_style:
-                parent_hidden = True
-                break
-            parent = parent.parent
-        if parent_hidden:
-            continue
-        identifier = (
-                input_tag.get('automation_id') or
-                input_tag.get('name') or
-                input_tag.get('id') or
-                input_tag.get('placeholder')
-        )
-        if identifier:
-            visible_fields.add(identifier.strip())
-    return visible_fields
+    with span("extract.visible_inputs"):
+        return set(as_snapshot(html).visible_inputs)
 
 def extract_visible_input_fields_with_values(html):
-    from bs4 import BeautifulSoup
-    soup = BeautifulSoup(html, 'html.parser')
-    fields = {}
-    for input_tag in soup.find_all('input'):
-        style = (input_tag.get('style', '') or '').replace(" ", "").lower()
-        input_type = (input_tag.get('type', '') or '').lower()
-        if 'display:none' in style or 'visibility:hidden' in style or input_type == 'hidden':
-            continue
-        # Skip if parent is hidden
-        parent = input_tag.parent
-        parent_hidden = False
-        while parent:
-            parent_style = (parent.get('style', '') or '').replace(" ", "").lower()
-            if 'display:none' in parent_style or 'visibility:hidden' in parent_style:
-                parent_hidden = True
-                break
-            parent = parent.parent
-        if parent_hidden:
-            continue
-        identifier = (
-                input_tag.get('automation_id') or
-                input_tag.get('name') or
-                input_tag.get('id') or
-                input_tag.get('placeholder')
-        )
-        value = input_tag.get('value', '')
-        if identifier and input_type != "password":
-            fields[identifier.strip()] = value
-    return fields
+    with span("extract.visible_input_values"):
+        return dict(as_snapshot(html).input_values)
 
 def extract_visible_login_buttons(html):
-    from bs4 import BeautifulSoup
-    soup = BeautifulSoup(html, 'html.parser')
-    buttons = []
-    for btn in soup.find_all(['input', 'button']):
-        style = (btn.get('style', '') or '').replace(" ", "").lower()
-        btn_type = (btn.get('type', '') or '').lower()
-        if 'display:none' in style or 'visibility:hidden' in style:
-            continue
-        if btn.name == 'input' and btn_type == 'submit':
-            label = btn.get('value', '').lower()
-            if 'login' in label:
-                buttons.append(btn)
-        elif btn.name == 'button':
-            label = (btn.get_text() or '').lower()
-            if 'login' in label:
-                buttons.append(btn)
-    return buttons
-
-def perform_ui_actions(page, actions, field_values, filled_fields):
+    with span("extract.login_buttons"):
+        return list(as_snapshot(html).login_buttons)
+
+def filled_field(result, matcher):
+    """The feature field a successful fill wrote to, judged by the element it actually hit."""
+    return matcher.field_for(result['element'].get('identifiers') or []) or result['action'].get('field')
+
+def mark_filled(results, matcher, filled_fields):
     """
-    Perform actions. Mark fields as filled *when the action is performed*, not by checking the DOM afterward.
+    Mark fields as filled from the executor's per-action results (even for password!).
+    A fill that wrote anything but the field's expected value counts as failed, so the
+    field stays unfilled and the action list is not cached.
     """
-    for action in actions:
-        logger.info(f" -> {action}")
-        try:
-            action_type = action['action'].lower()
-            selector = action['selector']
-            if action_type == 'click':
-                logger.info(f"Clicking {selector}")
-                page.wait_for_selector(selector, timeout=4000)
-                page.click(selector)
-            elif action_type in ['type', 'fill']:
-                page.wait_for_selector(selector, timeout=4000)
-                page.fill(selector, action['value'])
-                # Robust: Mark this key as filled immediately (even for password!)
-                for k, v in field_values.items():
-                    if v == action['value']:
-                        filled_fields.add(k.lower())
-            elif action_type == 'upload':
-                page.wait_for_selector(selector, timeout=4000)
-                page.set_input_files(selector, action['value'])
-        except Exception as e:
-            logger.error(f"⚠️ Failed to perform action {action}: {e}")
-
-def get_unfilled_fields(field_values, filled_fields, html):
-    visible_fields_with_values = extract_visible_input_fields_with_values(html)
-    still_unfilled = []
-    for key, expected_value in field_values.items():
-        if key.lower() in filled_fields:
-            continue  # Already filled (by action)
-        found = False
-        for ident, meta in visible_fields_with_values.items():
-            # Match by substring, ignore case
-            if key.replace(" ", "").lower() in ident.replace(" ", "").lower():
-                # Only check value for non-passwords
-                if meta['type'] == 'password':
-                    continue  # Trust action, not HTML
-                elif meta['value'].strip() == expected_value.strip():
-                    found = True
-                    break
-        if not found:
-            still_unfilled.append(key)
-    return still_unfilled
-
-def match_fields_to_visible(field_values, visible_fields, filled_fields):
+    for result in results:
+        if result['status'] == 'ok' and result['action']['action'].lower() in FILL_ACTIONS:
+            field = filled_field(result, matcher)
+            if field is None:
+                continue
+            if str(result['action'].get('value', '')).strip() == matcher.field_values[field].strip():
+                filled_fields.add(field.lower())
+                result['action']['field'] = field  # the cached template then names the field actually filled
+            else:
+                result['status'] = 'error'
+                result['error'] = f"filled a different value than field '{field}' expects"
+
+def report_action_results(results):
+    """Log each action's outcome; returns the failed actions and updates the action cache."""
+    failed = []
+    for result in results:
+        if result['status'] == 'ok':
+            logger.info(f" -> {result['action']}")
+        else:
+            logger.error(f"⚠️ Failed to perform action {result['action']}: {result['status']} {result['error'] or ''}")
+            failed.append(result['action'])
+    record_action_results([r['action'] for r in results], failed)
+    return failed
+
+def stream_executor(page, done):
+    """
+    on_action steps for get_next_actions when LLM_STREAMING is on: fills and uploads
+    run as soon as they stream in (results go to `done`), clicks wait for the whole plan.
+    """
+    if not LLM_STREAMING:
+        return None
+
+    def run_now(action):
+        if action['action'].lower() != 'click':
+            done.extend((yield from execute_steps(page, [action])))
+    return run_now
+
+def perform_ui_actions_steps(page, actions, matcher, filled_fields, done=()):
+    """
+    Perform actions through the batched executor. Fields are marked as filled from the
+    per-action results, not by checking the DOM afterward. `done` holds the results of
+    actions already run while the plan streamed in; they are skipped and reported here.
+    Returns the executor's per-action results; cached actions that failed are evicted from the action cache.
+    """
+    executed = {id(r['action']) for r in done}
+    results = list(done) + (yield from execute_steps(page, [a for a in actions if id(a) not in executed]))
+    mark_filled(results, matcher, filled_fields)
+    report_action_results(results)
+    return results
+
+def _shows_value(matcher, snapshot, key, expected_value):
+    # Passwords never show their value in the DOM: trust the action, not the HTML
+    if "password" in key.lower():
+        return False
+    return any(
+        entry['type'] != 'password' and (entry['value'] or '').strip() == expected_value.strip()
+        for entry in matcher.candidates(snapshot, key)
+    )
+
+def get_unfilled_fields(matcher, filled_fields, html):
+    """Fields neither filled by an action nor already showing their expected value in the DOM."""
+    snapshot = as_snapshot(html)
+    return [
+        key for key, expected_value in matcher.field_values.items()
+        if key.lower() not in filled_fields and not _shows_value(matcher, snapshot, key, expected_value)
+    ]
+
+def match_fields_to_visible(matcher, html, filled_fields):
     """
     Returns a dict of {key: value} for only the fields that are visible and not yet filled.
-    Uses substring and case-insensitive matching.
     """
-    matched = {}
-    for key, value in field_values.items():
-        if key in filled_fields:
+    visible = matcher.match(as_snapshot(html))
+    return {k: v for k, v in matcher.field_values.items() if k in visible and k.lower() not in filled_fields}
+
+def fields_to_fill(matcher, snapshot, filled_fields):
+    """
+    Decide what still needs to be filled: skip fields we've already filled, and mark
+    non-password fields whose DOM value already matches as filled.
+    """
+    visible = matcher.match(snapshot)
+    to_fill_fields = {}
+    for key, expected_value in matcher.field_values.items():
+        if key.lower() in filled_fields or key not in visible:
             continue
-        for vis in visible_fields:
-            # Fuzzy match: key must be a substring in the visible field identifier
-            if key.replace(" ", "").lower() in vis.replace(" ", "").lower():
-                matched[key] = value
-                break
-    return matched
-
-def run_agent(field_values, additional_goal):
-    from collections import defaultdict
-    from playwright.sync_api import sync_playwright
-    import time
-
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False)
-        page = browser.new_page()
-        page.goto(os.getenv("APP_URL") or "https://gmail.com/")
-        page.wait_for_timeout(500)
-
-        phase = 1
-        max_phases = 8
-        phase_htmls = defaultdict(str)
-        filled_fields = set()
-        login_clicked = False
-
-        while phase <= max_phases:
-            logger.info(f"\n🔁 Phase {phase}: Starting with goal: {additional_goal}")
-            current_html = page.content()
-            visible_fields = extract_visible_input_fields(current_html)
-            visible_fields_with_values = extract_visible_input_fields_with_values(current_html)
-
-            # Decide what still needs to be filled (exclude those we've already filled, or that are already filled in the DOM)
-            to_fill_fields = {}
-            for key, expected_value in field_values.items():
-                key_lc = key.lower()
-                if key_lc in filled_fields:
-                    continue
-                # For non-password fields, check if visible and already filled in the DOM
-                is_password = "password" in key_lc
-                if is_password:
-                    # For password, rely only on filled_fields
-                    if key_lc not in filled_fields and any(key_lc in ident.lower() for ident in visible_fields):
-                        to_fill_fields[key] = expected_value
-                else:
-                    found = False
-                    for ident, val in visible_fields_with_values.items():
-                        if key_lc in ident.lower() and val.strip() == expected_value.strip():
-                            found = True
-                            filled_fields.add(key_lc)
-                            break
-                    if not found and any(key_lc in ident.lower() for ident in visible_fields):
-                        to_fill_fields[key] = expected_value
+        if _shows_value(matcher, snapshot, key, expected_value):
+            filled_fields.add(key.lower())
+        else:
+            to_fill_fields[key] = expected_value
+    return to_fill_fields
+
+def login_button_selector(buttons):
+    for btn in buttons:
+        if btn.get('automation_id'):
+            return f"[automation_id='{btn.get('automation_id')}']"
+        elif btn.get('id'):
+            return f"#{btn.get('id')}"
+        elif btn.get('name'):
+            return f"[name='{btn.get('name')}']"
+        elif btn.get('value'):
+            return f"input[value='{btn.get('value')}']"
+    return None
+
+def unfilled_fields(field_values, filled_fields):
+    return [k for k in field_values.keys() if k.lower() not in filled_fields]
+
+def expect_next_fields(field_values, filled_fields):
+    return expected_field_selector(unfilled_fields(field_values, filled_fields))
+
+def phase_loop(page, field_values, additional_goal, extraction_backend=None, max_phases=8,
+               settle_options=None, planning=None, html_sink=None):
+    """
+    The phase loop as steps for core.drive, written once for both runners: run_phases
+    drives it on a sync page and async_runner.run_phases_async on an async one.
+    """
+    planner = BatchedPlanner(field_values, additional_goal) if (planning or PLANNING_MODE) == "batched" else None
+    differ = PhaseDiffer()
+    matcher = FieldMatcher(field_values)
+    rules = RulePlanner(matcher) if RULE_PLANNER_ENABLED else None
+    started = time.time()
+    start = time.perf_counter()
+    phase_details = []
+    phase = 1
+    phase_htmls = defaultdict(str)
+    filled_fields = set()
+    login_clicked = False
+    new_html = ""
+
+    while phase <= max_phases:
+        logger.info(f"\n🔁 Phase {phase}: Starting with goal: {additional_goal}")
+        with span("phase", phase=phase):
+            mark = phase_mark()
+            snapshot = yield from snapshot_steps(page, extraction_backend)
+            visible_fields = extract_visible_input_fields(snapshot)
+            visible_fields_with_values = extract_visible_input_fields_with_values(snapshot)
+            to_fill_fields = fields_to_fill(matcher, snapshot, filled_fields)
 
             logger.info(f"🖼️ Visible fields: {visible_fields}")
             logger.info(f"🖼️ Visible fields with values: {visible_fields_with_values}")
             logger.info(f"✏️ Fields to fill this phase: {to_fill_fields}")
 
             actions = []
-            if to_fill_fields:
-                actions = get_next_actions(page, to_fill_fields, "")
-
-            # Add login button click if visible and not already clicked
-            visible_login_buttons = extract_visible_login_buttons(current_html)
-            btn_selector = None
-            if visible_login_buttons and not login_clicked:
-                for btn in visible_login_buttons:
-                    if btn.get('automation_id'):
-                        btn_selector = f"[automation_id='{btn.get('automation_id')}']"
-                        break
-                    elif btn.get('id'):
-                        btn_selector = f"#{btn.get('id')}"
-                        break
-                    elif btn.get('name'):
-                        btn_selector = f"[name='{btn.get('name')}']"
-                        break
-                    elif btn.get('value'):
-                        btn_selector = f"input[value='{btn.get('value')}']"
-                        break
-                if btn_selector:
+            streamed = []
+            skipped = False
+            if planner is not None:
+                try:
+                    actions = yield from planner.next_actions_steps(page, snapshot, unfilled_fields(field_values, filled_fields))
+                except Exception as e:
+                    logger.error(f"⚠️ Planning failed: {e}")
+            elif to_fill_fields:
+                # Fields the rules can place are filled without GPT; only the rest are prompted for
+                actions, ask = rules.plan(snapshot, to_fill_fields) if rules else ([], to_fill_fields)
+                # Prompt with only what changed since the last prompt, or skip GPT if nothing relevant did
+                focus = differ.focus(snapshot, ask) if ask else None
+                if ask and focus is None:
+                    logger.info("⏭️ No relevant DOM changes since the last prompt, skipping GPT.")
+                    skipped = True
+                elif ask:
+                    on_action = stream_executor(page, streamed)
+                    if on_action is not None:
+                        # Streamed fills run as they arrive, so the rules' fills go first to keep the planned order
+                        for action in actions:
+                            yield from on_action(action)
+                    planned = yield from get_next_actions_steps(page, ask, "", snapshot=snapshot, focus=focus,
+                                                                backend=extraction_backend,
+                                                                settle_options=settle_options, on_action=on_action)
+                    # Only a model answer can be skipped next time: a failed cached plan is
+                    # evicted, and the next phase must fall back to the model
+                    if not planned or not all(a.get('cached') for a in planned):
+                        differ.prompted(ask)
+                    actions += planned
+
+            # Add login button click if visible and not already clicked, unless the batched
+            # plan clicks that same button in this phase
+            if not login_clicked:
+                btn_selector = login_button_selector(extract_visible_login_buttons(snapshot))
+                planned = planner is not None and any(
+                    a['action'] == 'click' and a['selector'] == btn_selector for a in actions)
+                if btn_selector and not planned:
                     actions.append({'action': 'click', 'selector': btn_selector})
                     login_clicked = True
+            if skipped and not actions:
+                logger.info("🛑 Page is unchanged and there is nothing left to try. Ending test.")
+                phase_details.append(phase_detail(phase, mark, []))
+                break
 
             logger.info(f"🔁 Performing {len(actions)} actions.")
-            perform_ui_actions(page, actions, field_values, filled_fields)
+            results = yield from perform_ui_actions_steps(page, actions, matcher, filled_fields, streamed)
+            if rules is not None:
+                rules.report(results)
 
-            page.wait_for_timeout(1000)
-            new_html = page.content()
-            phase_htmls[phase] = new_html
+            # Ready as soon as the next unfilled field shows up or the page goes quiet
+            yield from settle_steps(page, expect_next_fields(field_values, filled_fields), settle_options)
+            with span("page.content"):
+                new_html = yield page.content()
+            detail = phase_detail(phase, mark, results)
+            if html_sink is None:
+                phase_htmls[phase] = new_html
+            else:
+                detail['html_hash'] = html_sink(new_html)
+            phase_details.append(detail)
 
-            # Check: Are all fields filled as per the feature file?
-            all_filled = True
-            for key in field_values.keys():
-                if key.lower() not in filled_fields:
-                    all_filled = False
-                    break
+        # Check: Are all fields filled as per the feature file?
+        not_filled = unfilled_fields(field_values, filled_fields)
+        if not not_filled:
+            logger.info("✅ All expected fields present and filled in the UI. Ending test.")
+            break
+        else:
+            logger.info(f"⚠️ Still unfilled fields in the UI: {not_filled}")
 
-            if all_filled:
-                logger.info("✅ All expected fields present and filled in the UI. Ending test.")
-                break
-            else:
-                not_filled = [k for k in field_values.keys() if k.lower() not in filled_fields]
-                logger.info(f"⚠️ Still unfilled fields in the UI: {not_filled}")
+        phase += 1
+
+    result = {
+        'passed': not unfilled_fields(field_values, filled_fields),
+        'filled': sorted(filled_fields),
+        'unfilled': unfilled_fields(field_values, filled_fields),
+        'phases': min(phase, max_phases),
+        'duration': round(time.perf_counter() - start, 3),
+        'started': started,
+        'phase_details': phase_details,
+    }
+    if planner is not None:
+        result['llm_calls'] = planner.calls
+    return result, phase_htmls
+
+def run_phases(page, field_values, additional_goal, extraction_backend=None, max_phases=8,
+               settle_options=None, planning=None, html_sink=None):
+    """
+    Phase loop on an already opened page. Returns the scenario result and the
+    per-phase HTML. planning="batched" asks the model for one conditional plan up front
+    instead of calling it every phase. With `html_sink` each page is handed over as soon
+    as its phase ends and only the hash it returns is kept (in the phase details).
+    """
+    return drive(phase_loop(page, field_values, additional_goal, extraction_backend, max_phases, settle_options,
+                            planning, html_sink))
+
+def app_url():
+    return os.getenv("APP_URL") or "https://gmail.com/"
+
+def save_phase_htmls(phase_htmls, artifacts_dir=None):
+    """
+    Without artifacts_dir only the last phase is written to the current directory.
+    With it, every phase is kept so suite runs don't overwrite each other.
+    """
+    if not phase_htmls:
+        return []
+    if artifacts_dir:
+        os.makedirs(artifacts_dir, exist_ok=True)
+        phases = sorted(phase_htmls)
+    else:
+        phases = [max(phase_htmls)]
+    paths = []
+    for phase in phases:
+        path = os.path.join(artifacts_dir or ".", f"phase_{phase}_ui.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(phase_htmls[phase])
+        paths.append(path)
+    return paths
+
+def enter_session(page, session, restored, extraction_backend=None, settle_options=None):
+    """
+    Get a @requires scenario's page logged in. A restored session is kept unless the
+    login form shows up again; otherwise the provider's login runs here first and its
+    storage state is cached for the next scenarios. Returns False if the login failed.
+    """
+    login_values, login_goal = session['login']
+    if restored:
+        if not session_expired(take_snapshot(page, extraction_backend), login_values):
+            logger.info(f"🔑 Reusing the cached '{session['name']}' session.")
+            return True
+        logger.info(f"🔑 Cached '{session['name']}' session was rejected, logging in again.")
+        drop_session(session['key'])
+    with span("session.login", session=session['name']):
+        login, _ = run_phases(page, login_values, login_goal, extraction_backend, settle_options=settle_options)
+    if not login['passed']:
+        logger.error(f"❌ Precondition '{session['name']}' failed: unfilled {login['unfilled']}")
+        return False
+    save_session(session['key'], page.context.storage_state())
+    return True
+
+def precondition_failed(field_values, session):
+    return {
+        'passed': False,
+        'filled': [],
+        'unfilled': sorted(field_values),
+        'phases': 0,
+        'duration': 0.0,
+        'error': f"precondition '{session['name']}' failed",
+    }
+
+def run_agent(field_values, additional_goal, extraction_backend=None, headless=None, artifacts_dir=None,
+              settle_options=None, planning=None, trace_name="run_agent", session=None, browser_profile=None,
+              keep_html=True):
+    """
+    `session` (see core.session_cache.scenario_session) starts the scenario from a cached
+    logged-in state, or saves that state once a login scenario passes. `browser_profile`
+    (see core.browser) defaults to BROWSER_PROFILE; `headless` overrides the profile's.
+    keep_html=False writes each phase's page to the result store when the phase ends
+    instead of holding all of them until the run finishes (no HTML artifacts then;
+    with RESULTS=0 the pages are kept as usual).
+    """
+    from core.browser import browser_context
+
+    tracer = start_trace(trace_name, collect=RESULTS_ENABLED)
+    html_sink = persist_html if not keep_html and get_result_store() else None
+    requires = session is not None and not session['provides']
+    state = load_session(session['key']) if requires else None
+    context_options = {'storage_state': state} if state else {}
+    with browser_context(browser_profile, headless, **context_options) as (context, blocked):
+        page = context.new_page()
+        with span("page.goto"):
+            page.goto(app_url())
+        # Without a cached session the login form comes first
+        first_fields = session['login'][0] if requires and state is None else field_values
+        settle(page, expect_next_fields(first_fields, set()), settle_options)
 
-            phase += 1
+        logged_in = not requires or enter_session(page, session, state is not None, extraction_backend,
+                                                  settle_options)
+        if not logged_in:
+            result, phase_htmls = precondition_failed(field_values, session), {}
+        else:
+            if requires:
+                settle(page, expect_next_fields(field_values, set()), settle_options)
+            result, phase_htmls = run_phases(page, field_values, additional_goal, extraction_backend,
+                                             settle_options=settle_options, planning=planning,
+                                             html_sink=html_sink)
+            if session is not None and session['provides'] and result['passed']:
+                save_session(session['key'], context.storage_state())
 
-        with open(f"phase_{phase}_ui.html", "w", encoding="utf-8") as f:
-            f.write(new_html)
-        page.wait_for_timeout(2000)
-        browser.close()
+        result['artifacts'] = save_phase_htmls(phase_htmls, artifacts_dir)
+    result['blocked_requests'] = blocked['blocked']
+    result['run_id'] = record_run(trace_name, result, phase_htmls)
+    result['trace'] = finish_trace(tracer, logger)
+    return result
 
 def split_goal_steps(goal_text):
     return [step.strip() for step in goal_text.split("then") if step.strip()]
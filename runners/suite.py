@@ -0,0 +1,159 @@
+import argparse
+import heapq
+import json
+import os
+import re
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from core.browser import PROFILES
+from core.feature_parser import discover_scenarios
+from utils.config import SUITE_TIMINGS_FILE
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# Expected duration for scenarios that have never run
+DEFAULT_DURATION = 30.0
+
+
+def scenario_id(feature_path, scenario):
+    return f"{feature_path}::{scenario}"
+
+
+def load_timings(path=SUITE_TIMINGS_FILE):
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    return {}
+
+
+def save_timings(timings, path=SUITE_TIMINGS_FILE):
+    with open(path, "w") as f:
+        json.dump(timings, f, indent=2, sort_keys=True)
+
+
+def make_shards(scenarios, workers, timings=None):
+    """
+    Longest-expected-first greedy assignment to the least loaded shard, so shards
+    finish at about the same time. Unknown scenarios get the median known duration.
+    """
+    timings = timings or {}
+    known = [timings[scenario_id(*s)] for s in scenarios if scenario_id(*s) in timings]
+    default = statistics.median(known) if known else DEFAULT_DURATION
+    expected = {s: timings.get(scenario_id(*s), default) for s in scenarios}
+
+    shards = [[] for _ in range(max(1, workers))]
+    heap = [(0.0, i) for i in range(len(shards))]
+    for s in sorted(scenarios, key=lambda s: -expected[s]):
+        load, i = heapq.heappop(heap)
+        shards[i].append(s)
+        heapq.heappush(heap, (load + expected[s], i))
+    return [shard for shard in shards if shard]
+
+
+def _slug(text):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', text).strip('_')
+
+
+def run_shard(shard_index, shard, artifacts_root, headless=True, extraction_backend=None, browser_profile=None,
+              tokens_per_minute=0):
+    """Worker process entry point: runs its scenarios one after another through run_agent."""
+    from core.feature_parser import extract_field_value_map
+    from core.llm import set_token_budget
+    from core.result_store import record_run
+    from core.session_cache import scenario_session
+    from core.settle import tagged_settle_options
+    from runners.run_tests import app_url, run_agent
+
+    if tokens_per_minute:
+        set_token_budget(tokens_per_minute)
+    results = []
+    for feature_path, scenario in shard:
+        start = time.perf_counter()
+        artifacts_dir = os.path.join(artifacts_root, _slug(scenario_id(feature_path, scenario)))
+        try:
+            field_values, additional_goal = extract_field_value_map(feature_path, scenario)
+            result = run_agent(field_values, additional_goal, extraction_backend=extraction_backend,
+                               headless=headless, artifacts_dir=artifacts_dir,
+                               trace_name=scenario_id(feature_path, scenario),
+                               session=scenario_session(feature_path, scenario, app_url()),
+                               settle_options=tagged_settle_options(feature_path, scenario),
+                               browser_profile=browser_profile)
+        except Exception as e:
+            result = {'passed': False, 'error': str(e), 'duration': round(time.perf_counter() - start, 3)}
+            result['run_id'] = record_run(scenario_id(feature_path, scenario), result)
+        result['duration'] = round(time.perf_counter() - start, 3)
+        results.append({'feature': feature_path, 'scenario': scenario, 'shard': shard_index, **result})
+    return results
+
+
+def run_suite(features_dir="features", workers=None, report_dir="reports", headless=True,
+              extraction_backend=None, timings_path=SUITE_TIMINGS_FILE, browser_profile=None, tokens_per_minute=0):
+    """tokens_per_minute (0 = no limit) is the budget of the whole suite, split evenly across the workers."""
+    workers = workers or os.cpu_count() or 1
+    scenarios = discover_scenarios(features_dir)
+    timings = load_timings(timings_path)
+    shards = make_shards(scenarios, workers, timings)
+    artifacts_root = os.path.join(report_dir, "artifacts")
+    shard_budget = max(1, tokens_per_minute // max(1, len(shards))) if tokens_per_minute else 0
+    logger.info(f"🧩 {len(scenarios)} scenarios in {len(shards)} shards")
+
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=len(shards) or 1) as pool:
+        futures = [
+            pool.submit(run_shard, i, shard, artifacts_root, headless, extraction_backend, browser_profile,
+                        shard_budget)
+            for i, shard in enumerate(shards)
+        ]
+        for future in as_completed(futures):
+            results.extend(future.result())
+    wall_time = time.perf_counter() - start
+
+    results.sort(key=lambda r: (r['feature'], r['scenario']))
+    for r in results:
+        timings[scenario_id(r['feature'], r['scenario'])] = r['duration']
+    save_timings(timings, timings_path)
+
+    shard_times = {}
+    for r in results:
+        shard_times[r['shard']] = shard_times.get(r['shard'], 0.0) + r['duration']
+
+    report = {
+        'workers': len(shards),
+        'wall_time': round(wall_time, 3),
+        'total_scenario_time': round(sum(r['duration'] for r in results), 3),
+        'shard_times': {str(k): round(v, 3) for k, v in sorted(shard_times.items())},
+        'passed': sum(1 for r in results if r.get('passed')),
+        'failed': sum(1 for r in results if not r.get('passed')),
+        'results': results,
+    }
+    os.makedirs(report_dir, exist_ok=True)
+    with open(os.path.join(report_dir, "suite_report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run every scenario under features/ across worker processes.")
+    parser.add_argument("--features", default="features")
+    parser.add_argument("--workers", type=int, default=None, help="defaults to the CPU count")
+    parser.add_argument("--report-dir", default="reports")
+    parser.add_argument("--headed", action="store_true")
+    parser.add_argument("--profile", choices=sorted(PROFILES), help="browser profile, defaults to BROWSER_PROFILE")
+    parser.add_argument("--tokens-per-minute", type=int, default=0,
+                        help="LLM token budget shared by all workers (default: no limit)")
+    args = parser.parse_args()
+
+    report = run_suite(args.features, args.workers, args.report_dir, headless=not args.headed,
+                       browser_profile=args.profile, tokens_per_minute=args.tokens_per_minute)
+    for r in report['results']:
+        status = "PASS" if r.get('passed') else "FAIL"
+        print(f"{status}  {r['duration']:>7.2f}s  [shard {r['shard']}]  {r['feature']}::{r['scenario']}")
+    print(f"{report['passed']}/{len(report['results'])} passed, wall {report['wall_time']:.2f}s, "
+          f"scenario time {report['total_scenario_time']:.2f}s on {report['workers']} workers")
+
+
+if __name__ == "__main__":
+    main()
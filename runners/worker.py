@@ -0,0 +1,332 @@
+import argparse
+import gc
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from core.browser import PROFILES
+from core.job_queue import JobQueue
+from runners.suite import scenario_id
+from utils.config import (
+    JOB_QUEUE_DIR, WORKER_METRICS_WINDOW_S, WORKER_POLL_S, WORKER_RECYCLE_AFTER, WORKER_STALE_S,
+)
+from utils.logger import get_logger
+from utils.memory import load_memory, resolve
+
+logger = get_logger()
+
+
+def rss_mb():
+    """Resident memory of this process (not the browser's), or None where /proc isn't available."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20, 1)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class WorkerMetrics:
+    """Counters of one worker process; snapshot() adds the live queue depth and LLM gateway stats."""
+
+    def __init__(self, queue, window=WORKER_METRICS_WINDOW_S):
+        self.queue = queue
+        self.window = window
+        self.started = time.time()
+        self.finished = deque()  # finish times inside the window
+        self.counts = {'jobs_done': 0, 'jobs_passed': 0, 'jobs_failed': 0}
+        self.busy_s = 0.0
+        self.current = None
+        self.lock = threading.Lock()
+
+    def job_started(self, job):
+        with self.lock:
+            self.current = job['id']
+
+    def job_finished(self, result, duration):
+        now = time.time()
+        with self.lock:
+            self.current = None
+            self.counts['jobs_done'] += 1
+            self.counts['jobs_passed' if result.get('passed') else 'jobs_failed'] += 1
+            self.busy_s += duration
+            self.finished.append(now)
+
+    def snapshot(self):
+        from core.llm import get_gateway
+
+        now = time.time()
+        with self.lock:
+            while self.finished and self.finished[0] < now - self.window:
+                self.finished.popleft()
+            window = min(self.window, now - self.started) or 1.0
+            done = self.counts['jobs_done']
+            return {
+                'host': socket.gethostname(),
+                'pid': os.getpid(),
+                'updated': now,
+                'uptime_s': round(now - self.started, 1),
+                **self.counts,
+                'jobs_per_min': round(len(self.finished) * 60 / window, 2),
+                'avg_job_s': round(self.busy_s / done, 2) if done else None,
+                'utilization': round(self.busy_s / max(now - self.started, 1e-9), 3),
+                'current_job': self.current,
+                'queue_depth': self.queue.depth(),
+                'queue_running': self.queue.running(),
+                'rss_mb': rss_mb(),
+                'llm': dict(get_gateway().stats),
+            }
+
+    def prometheus(self):
+        stats = self.snapshot()
+        lines = []
+        for name, kind in (('jobs_done', 'counter'), ('jobs_passed', 'counter'), ('jobs_failed', 'counter'),
+                           ('jobs_per_min', 'gauge'), ('utilization', 'gauge'), ('queue_depth', 'gauge'),
+                           ('queue_running', 'gauge'), ('rss_mb', 'gauge'), ('uptime_s', 'gauge')):
+            if stats[name] is not None:
+                lines += [f"# TYPE worker_{name} {kind}", f"worker_{name} {stats[name]}"]
+        for name, value in stats['llm'].items():
+            lines += [f"# TYPE worker_llm_{name} counter", f"worker_llm_{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        """Publish the snapshot to <queue>/workers/<host>-<pid>.json for `worker status`."""
+        path = os.path.join(self.queue.root, "workers", f"{socket.gethostname()}-{os.getpid()}.json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp, path)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    metrics = None
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = self.metrics.prometheus(), "text/plain; version=0.0.4"
+        elif self.path in ("/", "/stats"):
+            body, content_type = json.dumps(self.metrics.snapshot(), indent=2), "application/json"
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_metrics_server(metrics, port):
+    """GET /metrics (Prometheus text) and /stats (JSON) on localhost."""
+    handler = type("Handler", (MetricsHandler,), {'metrics': metrics})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"📈 Worker metrics on http://127.0.0.1:{server.server_address[1]}/metrics")
+    return server
+
+
+def warm_up(browser_profile, headless=None):
+    """Launch the shared browser and build the OpenAI client before the first job arrives."""
+    from core.browser import browser_context
+    from core.llm import get_client
+
+    with browser_context(browser_profile, headless):
+        pass
+    try:
+        get_client()
+    except Exception as e:
+        logger.warning(f"⚠️ OpenAI client not ready yet: {e}")
+
+
+def run_job(job, browser_profile, headless=None):
+    """Run one queued scenario; the result is small because its phase HTML went to the result store."""
+    from core.feature_parser import extract_field_value_map
+    from core.result_store import record_run
+    from core.session_cache import scenario_session
+    from core.settle import tagged_settle_options
+    from runners.run_tests import app_url, run_agent
+
+    if job.get('error'):
+        return {'passed': False, 'error': job['error']}
+    # Shortcuts are read per job so ones saved while the worker runs are found
+    feature_path, scenario = resolve(job['target'], load_memory())
+    if not feature_path:
+        return {'passed': False, 'error': f"unknown shortcut or feature path {job['target']!r}"}
+
+    start = time.perf_counter()
+    try:
+        field_values, additional_goal = extract_field_value_map(feature_path, scenario)
+        result = run_agent(field_values, additional_goal, headless=headless,
+                           trace_name=scenario_id(feature_path, scenario),
+                           session=scenario_session(feature_path, scenario, app_url()),
+                           settle_options=tagged_settle_options(feature_path, scenario),
+                           browser_profile=browser_profile, keep_html=False)
+    except Exception as e:
+        result = {'passed': False, 'error': str(e)}
+        result['run_id'] = record_run(scenario_id(feature_path, scenario), result)
+    result.pop('phase_details', None)  # already in the result store under run_id
+    result['duration'] = round(time.perf_counter() - start, 3)
+    return {'feature': feature_path, 'scenario': scenario, **result}
+
+
+def serve(queue, browser_profile="performance", headless=None, poll_s=WORKER_POLL_S,
+          recycle_after=WORKER_RECYCLE_AFTER, metrics_port=None, until_empty=False):
+    """
+    Take jobs off the queue one at a time until SIGTERM/Ctrl-C (or, with until_empty, until
+    the queue is drained). The browser is launched once and shared by every job (each still
+    gets a fresh context), and is relaunched every `recycle_after` jobs since Chromium's
+    memory only grows. Returns the final metrics snapshot.
+    """
+    from core.browser import close_browsers, get_profile
+    from core.result_store import get_result_store
+
+    if get_result_store() is None:
+        # Without the store there is nowhere to put each phase's HTML, so every job would hold it all again
+        raise RuntimeError("the worker needs the result store; unset RESULTS=0")
+    profile = dict(get_profile(browser_profile), reuse_browser=True)
+    queue.recover()
+    metrics = WorkerMetrics(queue)
+    server = start_metrics_server(metrics, metrics_port) if metrics_port is not None else None
+
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        logger.info("🛑 Stopping after the current job (again to abort)")
+        stop.set()
+        signal.signal(signum, signal.SIG_DFL)
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, request_stop)
+
+    logger.info(f"🏭 Worker {os.getpid()} serving {queue.root} with the '{profile['name']}' profile")
+    warm_up(profile, headless)
+    metrics.write()
+    try:
+        while not stop.is_set():
+            job = queue.claim()
+            if job is None:
+                if until_empty:
+                    break
+                stop.wait(poll_s)
+                queue.recover()  # jobs of workers elsewhere that stopped sending heartbeats
+                metrics.write()
+                continue
+
+            logger.info(f"▶️ Job {job['id']}: {job.get('target')}")
+            metrics.job_started(job)
+            start = time.perf_counter()
+            try:
+                with queue.keep_alive(job):
+                    result = run_job(job, profile, headless)
+            except Exception as e:
+                result = {'passed': False, 'error': str(e)}
+            queue.finish(job, result)
+            metrics.job_finished(result, time.perf_counter() - start)
+            logger.info(f"{'✅' if result.get('passed') else '❌'} Job {job['id']} finished in "
+                        f"{time.perf_counter() - start:.2f}s ({queue.depth()} queued)")
+            del job, result
+            gc.collect()  # the page's soup trees are cyclic; free them before the next job
+            if recycle_after and metrics.counts['jobs_done'] % recycle_after == 0:
+                close_browsers(stop_driver=False)
+            metrics.write()
+    finally:
+        if server is not None:
+            server.shutdown()
+        close_browsers()
+    return metrics.snapshot()
+
+
+def submit(queue, targets, wait=False, timeout=None):
+    ids = [queue.submit(target) for target in targets]
+    for job_id, target in zip(ids, targets):
+        print(f"{job_id}  {target}")
+    if not wait:
+        return 0
+    deadline = time.time() + timeout if timeout else None
+    finished = {}
+    while len(finished) < len(ids):
+        if deadline and time.time() > deadline:
+            print(f"Timed out with {len(ids) - len(finished)} jobs unfinished")
+            return 1
+        for job_id in ids:
+            if job_id not in finished:
+                job = queue.result(job_id)
+                if job is not None:
+                    finished[job_id] = job
+                    result = job['result']
+                    status = "PASS" if result.get('passed') else "FAIL"
+                    print(f"{status}  {result.get('duration') or 0:>7.2f}s  {job_id}  {job['target']}"
+                          f"{'  ' + result['error'] if result.get('error') else ''}")
+        time.sleep(0.5)
+    return 0 if all(job['result'].get('passed') for job in finished.values()) else 1
+
+
+def status(queue):
+    """Queue depth plus the metrics each live worker last published."""
+    from core.job_queue import pid_alive
+
+    print(f"queue {queue.root}: {queue.depth()} pending, {queue.running()} running")
+    workers_dir = os.path.join(queue.root, "workers")
+    names = sorted(os.listdir(workers_dir)) if os.path.isdir(workers_dir) else []
+    now, host = time.time(), socket.gethostname()
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(workers_dir, name), "r") as f:
+                m = json.load(f)
+        except (OSError, ValueError):
+            continue
+        # Workers write after every job and every idle poll; a local one may be deep in a long job
+        live = now - m['updated'] <= WORKER_STALE_S or (m.get('host') == host and pid_alive(m['pid']))
+        if not live:
+            continue
+        print(f"worker {m.get('host')}:{m['pid']}: {m['jobs_done']} done ({m['jobs_failed']} failed), "
+              f"{m['jobs_per_min']}/min, {m['utilization'] * 100:.0f}% busy, "
+              f"rss {m['rss_mb']} MB, current {m['current_job'] or '-'}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-running scenario worker fed from a job queue.")
+    parser.add_argument("--queue", default=JOB_QUEUE_DIR, help="job spool directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_cmd = commands.add_parser("serve", help="run queued jobs until stopped")
+    serve_cmd.add_argument("--profile", choices=sorted(PROFILES), default="performance")
+    serve_cmd.add_argument("--headed", action="store_true")
+    serve_cmd.add_argument("--metrics-port", type=int, help="serve /metrics and /stats on this localhost port")
+    serve_cmd.add_argument("--until-empty", action="store_true", help="exit once the queue is drained")
+    submit_cmd = commands.add_parser("submit", help="queue scenarios")
+    submit_cmd.add_argument("targets", nargs="+", help="shortcut names or path.feature::Scenario")
+    submit_cmd.add_argument("--wait", action="store_true", help="wait for the results")
+    submit_cmd.add_argument("--timeout", type=float)
+    commands.add_parser("status", help="queue depth and worker throughput")
+    args = parser.parse_args()
+
+    queue = JobQueue(args.queue)
+    if args.command == "serve":
+        try:
+            stats = serve(queue, args.profile, headless=False if args.headed else None,
+                          metrics_port=args.metrics_port, until_empty=args.until_empty)
+        except RuntimeError as e:
+            print(f"Cannot start the worker: {e}")
+            return 1
+        print(json.dumps(stats, indent=2))
+        return 0
+    if args.command == "submit":
+        return submit(queue, args.targets, args.wait, args.timeout)
+    return status(queue)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
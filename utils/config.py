@@ -1,3 +1,92 @@
+import os
+from dotenv import load_dotenv
+
+# Read .env before any knob below (and before APP_URL is looked up), so every setting can live
+# there; variables already set in the environment win. Only the API key is checked lazily.
+load_dotenv()
+
 DEFAULT_URL = "https://myhubstaging.smdservers.net/"
 DEFAULT_GOAL = "Click on the Login button."
-MEMORY_FILE = "shortcuts.json"
\ No newline at end of file
+MEMORY_FILE = "shortcuts.json"
+
+# "html" parses page.content() in Python, "browser" evaluates visibility in the page
+EXTRACTION_BACKEND = os.getenv("EXTRACTION_BACKEND", "html")
+
+# On-disk cache of validated action lists, kept next to shortcuts.json
+ACTION_CACHE_FILE = os.getenv("ACTION_CACHE_FILE", "action_cache.db")
+ACTION_CACHE_ENABLED = os.getenv("ACTION_CACHE", "1") != "0"
+
+# "full" sends raw element HTML, "compact" sends one ranked line per element within the budget
+UI_SUMMARY_MODE = os.getenv("UI_SUMMARY_MODE", "full")
+UI_SUMMARY_TOKEN_BUDGET = int(os.getenv("UI_SUMMARY_TOKEN_BUDGET", "1500"))
+
+# Per-scenario durations from previous suite runs, used to balance shards
+SUITE_TIMINGS_FILE = os.getenv("SUITE_TIMINGS_FILE", "suite_timings.json")
+
+# Settle waits (milliseconds): overall upper bound, DOM quiet window, and the cap on
+# waiting for network idle (long-polling pages never go idle; 0 disables it)
+SETTLE_TIMEOUT_MS = int(os.getenv("SETTLE_TIMEOUT_MS", "5000"))
+SETTLE_QUIET_MS = int(os.getenv("SETTLE_QUIET_MS", "200"))
+SETTLE_NETWORK_IDLE_MS = int(os.getenv("SETTLE_NETWORK_IDLE_MS", "2000"))
+
+# "phase" asks the model every phase, "batched" plans the whole flow in one or two calls
+PLANNING_MODE = os.getenv("PLANNING_MODE", "phase")
+
+# Per-scenario timing spans: "jsonl" or "chrome" (chrome://tracing / Perfetto) files in TRACE_DIR
+TRACING_ENABLED = os.getenv("TRACING", "1") != "0"
+TRACE_DIR = os.getenv("TRACE_DIR", "traces")
+TRACE_FORMAT = os.getenv("TRACE_FORMAT", "jsonl")
+
+# LLM gateway: per-request timeout (s), concurrent requests per process, retries on
+# 429/5xx/connection errors, and the tokens-per-minute budget shared by all scenarios of a process
+# (0 = no limit; concurrent runners opt in with --tokens-per-minute)
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4.1")
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "60"))
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "4"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE_S = float(os.getenv("LLM_BACKOFF_BASE_S", "1.0"))
+LLM_BACKOFF_MAX_S = float(os.getenv("LLM_BACKOFF_MAX_S", "20.0"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+
+# Action executor (milliseconds): one grace wait for selectors missing from a batch,
+# and the timeout for clicks/uploads/fills that Playwright performs itself
+ACTION_GRACE_MS = int(os.getenv("ACTION_GRACE_MS", "500"))
+ACTION_TIMEOUT_MS = int(os.getenv("ACTION_TIMEOUT_MS", "4000"))
+
+# Scenario result history (SQLite in RESULTS_DIR); RESULTS_BUILD labels the build for trends,
+# falling back to the CI build number or the git revision
+RESULTS_ENABLED = os.getenv("RESULTS", "1") != "0"
+RESULTS_DIR = os.getenv("RESULTS_DIR", "runs")
+RESULTS_BUILD = os.getenv("RESULTS_BUILD") or os.getenv("BUILD_NUMBER") or os.getenv("GITHUB_RUN_NUMBER")
+
+# Cached logged-in browser state (cookies + localStorage) for scenarios tagged @requires:<session>,
+# one JSON file per app URL and credentials in SESSION_DIR, reused for SESSION_TTL_S seconds
+SESSION_CACHE_ENABLED = os.getenv("SESSION_CACHE", "1") != "0"
+SESSION_DIR = os.getenv("SESSION_DIR", "sessions")
+SESSION_TTL_S = int(os.getenv("SESSION_TTL_S", "1800"))
+
+# Rule-based planning: fields whose input is identified with at least this confidence (0-1)
+# are filled without asking the model; RULE_PLANNER=0 sends every field to the model
+RULE_PLANNER_ENABLED = os.getenv("RULE_PLANNER", "1") != "0"
+RULE_PLANNER_MIN_CONFIDENCE = float(os.getenv("RULE_PLANNER_MIN_CONFIDENCE", "0.75"))
+
+# Browser profile for run_agent and the runners: "default" (headed, loads everything, a browser
+# per scenario) or "performance" (headless, blocks images/media/fonts/analytics, one shared browser).
+# BLOCKED_DOMAINS adds comma-separated hosts to block in any profile
+BROWSER_PROFILE = os.getenv("BROWSER_PROFILE", "default")
+BLOCKED_DOMAINS = tuple(d.strip().lower() for d in os.getenv("BLOCKED_DOMAINS", "").split(",") if d.strip())
+
+# Stream the model's reply and start filling fields as soon as each action is parsed
+LLM_STREAMING = os.getenv("LLM_STREAMING", "0") == "1"
+
+# Worker service (runners/worker.py): spool directory the jobs are queued in, how often an idle
+# worker looks for new ones (s), jobs run before the shared browser is relaunched to hand its
+# memory back (0 = never), and the window throughput is measured over (s)
+JOB_QUEUE_DIR = os.getenv("JOB_QUEUE_DIR", "jobs")
+WORKER_POLL_S = float(os.getenv("WORKER_POLL_S", "1.0"))
+WORKER_RECYCLE_AFTER = int(os.getenv("WORKER_RECYCLE_AFTER", "50"))
+WORKER_METRICS_WINDOW_S = float(os.getenv("WORKER_METRICS_WINDOW_S", "300"))
+# A running job's heartbeat is refreshed every WORKER_HEARTBEAT_S; after WORKER_STALE_S without one
+# any worker (on any host sharing the queue) puts the job back in the queue
+WORKER_HEARTBEAT_S = float(os.getenv("WORKER_HEARTBEAT_S", "10"))
+WORKER_STALE_S = float(os.getenv("WORKER_STALE_S", "60"))
@@ -12,3 +12,13 @@ def load_memory():
 def save_memory(memory):
     with open(MEMORY_FILE, "w") as f:
         json.dump(memory, f, indent=2)
+
+def resolve(target, memory):
+    """(feature_path, scenario) for a `path.feature::Scenario` string or a saved shortcut."""
+    if ".feature" in target and "::" in target:
+        feature_path, scenario = target.split("::")
+        return feature_path.strip(), scenario.strip()
+    saved = memory.get(target)
+    if saved and saved.get("feature_path") and saved.get("scenario"):
+        return saved["feature_path"], saved["scenario"]
+    return None, None
@@ -0,0 +1,139 @@
+import contextvars
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from utils.config import TRACE_DIR, TRACE_FORMAT, TRACING_ENABLED
+
+# The tracer of the scenario running in this thread / asyncio task
+_current = contextvars.ContextVar("tracer", default=None)
+
+
+class Tracer:
+    """
+    Collects timing spans for one scenario. Recording a span is two perf_counter
+    calls and a list append, so it is cheap enough to leave on; nothing is
+    written until the scenario finishes.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.origin = time.perf_counter()
+        self.wall_start = time.time()
+        self.spans = []
+
+    def record(self, name, start, duration, attrs):
+        self.spans.append((name, start - self.origin, duration, threading.get_ident(), attrs))
+
+    def to_jsonl(self):
+        return "\n".join(json.dumps({
+            'name': name,
+            'start_ms': round(start * 1000, 3),
+            'duration_ms': round(duration * 1000, 3),
+            **attrs
+        }) for name, start, duration, _, attrs in self.spans)
+
+    def to_chrome_trace(self):
+        events = [{
+            'name': name,
+            'cat': name.split(".")[0],
+            'ph': 'X',
+            'ts': round(start * 1e6, 1),
+            'dur': round(duration * 1e6, 1),
+            'pid': os.getpid(),
+            'tid': tid,
+            'args': attrs,
+        } for name, start, duration, tid, attrs in self.spans]
+        return json.dumps({'traceEvents': events, 'otherData': {'scenario': self.name}})
+
+    def write(self, trace_dir=TRACE_DIR, fmt=TRACE_FORMAT):
+        os.makedirs(trace_dir, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', self.name).strip('_') or "scenario"
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.wall_start))
+        if fmt == "chrome":
+            path = os.path.join(trace_dir, f"{slug}-{stamp}.trace.json")
+            content = self.to_chrome_trace()
+        else:
+            path = os.path.join(trace_dir, f"{slug}-{stamp}.jsonl")
+            content = self.to_jsonl()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def totals(self):
+        """{span name: [durations in seconds]}"""
+        totals = {}
+        for name, _, duration, _, _ in self.spans:
+            totals.setdefault(name, []).append(duration)
+        return totals
+
+    def llm_usage(self, since=0):
+        """(calls, prompt tokens, completion tokens) of the llm.call spans recorded after index `since`."""
+        llm = [attrs for name, _, _, _, attrs in self.spans[since:] if name == "llm.call"]
+        return (
+            len(llm),
+            sum(a.get('prompt_tokens', 0) or 0 for a in llm),
+            sum(a.get('completion_tokens', 0) or 0 for a in llm),
+        )
+
+    def summary(self):
+        rows = []
+        for name, durations in sorted(self.totals().items(), key=lambda item: -sum(item[1])):
+            durations = sorted(durations)
+            p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+            rows.append((name, len(durations), sum(durations) * 1000, p95 * 1000, durations[-1] * 1000))
+        lines = [f"{'span':<28}{'count':>7}{'total ms':>12}{'p95 ms':>10}{'max ms':>10}"]
+        for name, count, total, p95, worst in rows:
+            lines.append(f"{name:<28}{count:>7}{total:>12.1f}{p95:>10.1f}{worst:>10.1f}")
+        calls, prompt_tokens, completion_tokens = self.llm_usage()
+        if calls:
+            lines.append(f"LLM calls: {calls}, prompt tokens: {prompt_tokens}, completion tokens: {completion_tokens}")
+        return "\n".join(lines)
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Time a block under the current scenario's tracer. Yields the attrs dict so the
+    block can attach results (token counts, status) before the span is recorded.
+    """
+    tracer = _current.get()
+    if tracer is None:
+        yield attrs
+        return
+    start = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        tracer.record(name, start, time.perf_counter() - start, attrs)
+
+
+def start_trace(name, collect=False):
+    """
+    Start tracing a scenario in the current context; returns None when tracing is off,
+    unless `collect` asks for the spans anyway (the result store reads them).
+    """
+    if not (TRACING_ENABLED or collect):
+        return None
+    tracer = Tracer(name)
+    _current.set(tracer)
+    return tracer
+
+
+def finish_trace(tracer, logger=None):
+    """Write the trace file and log the summary table. Returns the trace path."""
+    if tracer is None:
+        return None
+    _current.set(None)
+    if not TRACING_ENABLED:
+        return None
+    path = tracer.write()
+    if logger:
+        logger.info(f"⏱️ Trace for {tracer.name} written to {path}\n{tracer.summary()}")
+    return path
+
+
+def current_tracer():
+    return _current.get()